@@ -0,0 +1,27 @@
+-- Migration 006: Indexes for the dashboard hot queries on wachet_changes
+-- Run with: psql "$DATABASE_URL" -f migrations/006_add_dashboard_indexes.sql
+--
+-- Purpose: /wachet-changes/filtered (status IN ('FILTERED','PENDING') ORDER BY
+-- created_at DESC LIMIT n), /wachet-changes?status=... and the GROUP BY in
+-- /wachet-changes/summary are polled constantly by the dashboard. Without these
+-- indexes every poll is a sequential scan + sort.
+--
+-- CONCURRENTLY avoids locking writes (ingestor / filter-worker) while building,
+-- so this file must NOT be wrapped in a transaction (psql -f is fine, -1 is not).
+
+-- 1. Partial index for the FILTERED/PENDING queue, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_filtered_pending_created
+    ON wachet_changes (created_at DESC)
+    WHERE status IN ('FILTERED', 'PENDING');
+
+-- 2. Single-status listing ordered by date (/wachet-changes?status=...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_status_created
+    ON wachet_changes (status, created_at DESC);
+
+-- 3. Covers the GROUP BY status, importance of /wachet-changes/summary
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_status_importance
+    ON wachet_changes (status, importance);
+
+-- idx_wachet_changes_status (000) is a prefix of idx_wachet_changes_status_created
+-- and becomes redundant; drop it once the new index is confirmed valid:
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_wachet_changes_status;
@@ -0,0 +1,70 @@
+-- Migration 007: Trigger-maintained counters for /wachet-changes/summary and /count
+-- Run with: psql "$DATABASE_URL" -f migrations/007_wachet_changes_counters.sql
+--
+-- Purpose: the dashboard polls /summary (GROUP BY status, importance) and /count
+-- (COUNT(*)) together; both scan the whole wachet_changes table. This keeps a
+-- small (status, importance) -> total table up to date with row-level triggers,
+-- so both endpoints read a handful of rows instead of the full table.
+--
+-- NULL status/importance are stored as '' (they are part of the primary key);
+-- the API maps them back to NULL. The API falls back to the GROUP BY query if
+-- this migration has not been applied.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS wachet_changes_counters (
+    status TEXT NOT NULL DEFAULT '',
+    importance TEXT NOT NULL DEFAULT '',
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (status, importance)
+);
+
+COMMENT ON TABLE wachet_changes_counters IS 'Row counts of wachet_changes per (status, importance), maintained by triggers';
+
+CREATE OR REPLACE FUNCTION wachet_changes_counters_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE wachet_changes_counters
+        SET total = total - 1
+        WHERE status = COALESCE(OLD.status, '')
+          AND importance = COALESCE(OLD.importance, '');
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO wachet_changes_counters (status, importance, total)
+        VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.importance, ''), 1)
+        ON CONFLICT (status, importance)
+        DO UPDATE SET total = wachet_changes_counters.total + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block writes while the triggers are installed and the table is backfilled,
+-- so no row is counted twice or missed.
+LOCK TABLE wachet_changes IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_wachet_changes_counters_ins_del ON wachet_changes;
+CREATE TRIGGER trg_wachet_changes_counters_ins_del
+    AFTER INSERT OR DELETE ON wachet_changes
+    FOR EACH ROW EXECUTE FUNCTION wachet_changes_counters_apply();
+
+DROP TRIGGER IF EXISTS trg_wachet_changes_counters_upd ON wachet_changes;
+CREATE TRIGGER trg_wachet_changes_counters_upd
+    AFTER UPDATE OF status, importance ON wachet_changes
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.importance IS DISTINCT FROM NEW.importance)
+    EXECUTE FUNCTION wachet_changes_counters_apply();
+
+-- Backfill from the current data
+DELETE FROM wachet_changes_counters;
+INSERT INTO wachet_changes_counters (status, importance, total)
+SELECT COALESCE(status, ''), COALESCE(importance, ''), COUNT(*)
+FROM wachet_changes
+GROUP BY COALESCE(status, ''), COALESCE(importance, '');
+
+COMMIT;
+
+-- Note: TRUNCATE wachet_changes does not fire row triggers; re-run the backfill
+-- (DELETE + INSERT ... SELECT above) after truncating.
@@ -0,0 +1,22 @@
+-- Migration 008: Trigram indexes for the dashboard text search
+-- Run with: psql "$DATABASE_URL" -f migrations/008_add_search_trgm_indexes.sql
+--
+-- Purpose: /wachet-changes?search=... and /wachet-changes/filtered?search=...
+-- filter with `title ILIKE '%q%' OR ai_reason ILIKE '%q%' OR url ILIKE '%q%'`.
+-- Unanchored LIKE cannot use a btree index, so every search is a sequential scan.
+-- GIN indexes with gin_trgm_ops serve LIKE/ILIKE '%q%' directly (bitmap OR of
+-- the three indexes), without changing the substring semantics of the search.
+-- Terms shorter than 3 characters have no trigrams and still fall back to a scan.
+--
+-- CONCURRENTLY avoids blocking writes; do NOT run inside a transaction (no psql -1).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_title_trgm
+    ON wachet_changes USING gin (title gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_ai_reason_trgm
+    ON wachet_changes USING gin (ai_reason gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_url_trgm
+    ON wachet_changes USING gin (url gin_trgm_ops);
@@ -0,0 +1,33 @@
+-- Migration 009: Indexes for keyset pagination and the ingest dedupe
+-- Run with: psql "$DATABASE_URL" -f migrations/009_add_keyset_dedupe_indexes.sql
+--
+-- Purpose: /wachet-changes now orders by (created_at DESC, id DESC) so the
+-- cursor / cursor_id pages are stable; the 006 indexes stop at created_at and
+-- leave an extra sort on id. /ingest/changes checks url + content_hash in the
+-- last 24 hours inside its INSERT (NOT EXISTS) and, on duplicates, looks up
+-- the newest matching row.
+--
+-- A partial index on "created_at > NOW() - INTERVAL '24 hours'" is not
+-- possible (NOW() is not immutable); created_at as the last key column gives
+-- the same range scan without periodic rebuilds.
+--
+-- CONCURRENTLY avoids locking writes (ingestor / filter-worker) while building,
+-- so this file must NOT be wrapped in a transaction (psql -f is fine, -1 is not).
+
+-- 1. Unfiltered listing + keyset cursor
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_created_id
+    ON wachet_changes (created_at DESC, id DESC);
+
+-- 2. Single-status listing + keyset cursor (/wachet-changes?status=...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_status_created_id
+    ON wachet_changes (status, created_at DESC, id DESC);
+
+-- 3. Ingest dedupe: same url + content_hash, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_url_hash_created
+    ON wachet_changes (url, content_hash, created_at DESC)
+    WHERE content_hash IS NOT NULL;
+
+-- idx_wachet_changes_created_at (000) and idx_wachet_changes_status_created (006)
+-- are prefixes of 1 and 2; drop them once the new indexes are confirmed valid:
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_wachet_changes_created_at;
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_wachet_changes_status_created;
@@ -0,0 +1,23 @@
+-- Migration 010: Full-text search column for the dashboard search (mode=fts)
+-- Run with: psql "$DATABASE_URL" -f migrations/010_add_search_tsvector.sql
+--
+-- Purpose: /wachet-changes?search=...&mode=fts matches words (Spanish stemming:
+-- "reformas" finds "reforma") in title and ai_reason instead of substrings.
+-- search_tsv is a STORED generated column, so ingest and the AI filter keep it
+-- up to date without any change in the services; a GIN index serves the
+-- `search_tsv @@ websearch_to_tsquery('spanish', :search)` filter.
+-- Without this migration mode=fts falls back to the ILIKE substring search
+-- (served by the trigram indexes of 008).
+--
+-- Adding a STORED generated column rewrites the table under an ACCESS EXCLUSIVE
+-- lock: run it in a maintenance window on large tables.
+-- The index uses CONCURRENTLY; do NOT run inside a transaction (no psql -1).
+
+ALTER TABLE wachet_changes
+    ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('spanish', coalesce(title, '') || ' ' || coalesce(ai_reason, ''))
+    ) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_search_tsv
+    ON wachet_changes USING gin (search_tsv);
@@ -0,0 +1,30 @@
+-- Migration 011: CHECK constraint on wachet_changes.status
+-- Run with: psql "$DATABASE_URL" -f migrations/011_add_status_check.sql
+--
+-- Purpose: enforce the set of valid statuses in the database for every writer
+-- (API, ingestor, filter-worker, manual SQL), not only in the API's PATCH.
+-- ERROR is included: filter-worker sets it when classification fails.
+--
+-- A CHECK on the existing TEXT column is used instead of converting the column
+-- to an ENUM type: no table rewrite, and the dashboard indexes (006/009), the
+-- counters triggers (007) and the text comparisons in the services keep working.
+-- NOT VALID + VALIDATE avoids blocking writes while existing rows are checked.
+-- If VALIDATE fails, find the offending rows with
+--   SELECT id, status FROM wachet_changes WHERE status NOT IN (...);
+-- fix them with UPDATE and re-run this file.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'chk_wachet_changes_status'
+          AND conrelid = 'wachet_changes'::regclass
+    ) THEN
+        ALTER TABLE wachet_changes
+            ADD CONSTRAINT chk_wachet_changes_status
+            CHECK (status IN ('NEW', 'PENDING', 'FILTERED', 'VALIDATED', 'PUBLISHED', 'DISCARDED', 'ERROR'))
+            NOT VALID;
+    END IF;
+END $$;
+
+ALTER TABLE wachet_changes VALIDATE CONSTRAINT chk_wachet_changes_status;
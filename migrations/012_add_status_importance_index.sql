@@ -0,0 +1,18 @@
+-- Migration 012: Composite index for /wachet-changes?status=...&importance=...
+-- Run with: psql "$DATABASE_URL" -f migrations/012_add_status_importance_index.sql
+--
+-- Purpose: with both filters the 009 index (status, created_at DESC, id DESC)
+-- still reads every row of that status and discards the other importance
+-- before reaching LIMIT. With importance as second key the scan starts on the
+-- matching (status, importance) range already in ORDER BY order: no filter, no sort.
+-- The (status, importance) prefix also serves the GROUP BY of /summary when
+-- the counters table (007) is not installed.
+--
+-- CONCURRENTLY avoids blocking writes; do NOT run inside a transaction (no psql -1).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wachet_changes_status_importance_created_id
+    ON wachet_changes (status, importance, created_at DESC, id DESC);
+
+-- idx_wachet_changes_status_importance (006) is a prefix of this index; drop it
+-- once the new one is confirmed valid:
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_wachet_changes_status_importance;
@@ -0,0 +1,561 @@
+"""
+Clasificación de cambios con OpenAI: esquemas, prompt, llamada al modelo y cache.
+main.py solo expone estas funciones como endpoints.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Literal, TypeVar
+
+import httpx
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, ValidationError, ValidationInfo, field_validator
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    BadRequestError,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    NotFoundError,
+    RateLimitError,
+)
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+# ---------- Config ----------
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Pool HTTP hacia OpenAI: el de por defecto se queda corto con el fan-out de /classify/many
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "200"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "100"))
+
+# Se crea en el arranque (lifespan de main.py) vía init_client(); el módulo se puede
+# importar sin OPENAI_API_KEY (tests, herramientas).
+client: AsyncOpenAI | None = None
+
+
+def init_client() -> AsyncOpenAI:
+    global client
+    if client is not None:
+        return client
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY no está definida en el entorno")
+
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        http2=True,
+    )
+    # Los reintentos los hace _call_openai (tenacity); sin esto el SDK reintentaría además por su cuenta.
+    # El timeout va en el cliente de OpenAI: el SDK lo pasa por petición al transporte.
+    client = AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        max_retries=0,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        http_client=http_client,
+    )
+    return client
+
+
+async def close_client() -> None:
+    global client
+    if client is not None:
+        await client.close()
+        client = None
+
+
+# Errores transitorios de OpenAI (429, 5xx, red/timeout) que se reintentan con backoff
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "5"))
+_RETRYABLE_OPENAI_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+# Máximo de cambios por llamada a /classify/batch (mantiene la respuesta dentro de max_tokens)
+MAX_BATCH_ITEMS = 25
+
+# Salida por clasificación: 6 campos cortos; temperatura 0 + seed fija para respuestas
+# reproducibles (mismo input => misma salida, coherente con la cache)
+_MAX_TOKENS_PER_CLASSIFICATION = 220
+_TEMPERATURE = 0
+_SEED = 42
+
+# Tope de caracteres enviados al modelo (acota tokens de entrada en páginas enormes)
+_MAX_DIFF_CHARS = 4000
+_MAX_SNIPPET_CHARS = 1500
+_TRUNCATION_MARKER = "\n...[truncado]...\n"
+
+# Cache de clasificaciones por contenido (mismo diff => misma clasificación)
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "4096"))
+CLASSIFICATION_CACHE_TTL_SECONDS = int(os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", "86400"))
+
+# ---------- Esquemas ----------
+
+class ChangeInput(BaseModel):
+    title: str | None = None
+    diff_text: str
+    current_snippet: str | None = None
+    previous_text: str | None = None
+    current_text: str | None = None
+    url: str | None = None
+    task_name: str | None = None
+    timestamp: str | None = None
+
+
+class ChangeOutput(BaseModel):
+    importance: Literal["IMPORTANT", "NOT_IMPORTANT"]
+    score: float = Field(ge=0.0, le=1.0)
+    reason: str
+    headline: str = Field(description="Idea principal en máximo 10 palabras")
+    source_name: str = Field(description="Nombre de la institución o fuente que emite el comunicado")
+    source_country: str = Field(description="País de la fuente (El Salvador, Guatemala, Honduras, Colombia, Perú, México, etc.)")
+
+
+class _LLMPayload(BaseModel):
+    """
+    JSON tal como lo devuelve el modelo. Se valida en una sola pasada con
+    model_validate_json; los validadores mantienen los valores por defecto tolerantes.
+    """
+
+    importance: Literal["IMPORTANT", "NOT_IMPORTANT"] = "NOT_IMPORTANT"
+    score: float = 0.5
+    reason: str = "Sin análisis disponible"
+    headline: str = "Actualización regulatoria"
+    source_name: str = "Fuente no identificada"
+    source_country: str = "País no identificado"
+
+    @field_validator("importance", mode="before")
+    @classmethod
+    def _coerce_importance(cls, value: Any) -> str:
+        return value if value in ("IMPORTANT", "NOT_IMPORTANT") else "NOT_IMPORTANT"
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def _clamp_score(cls, value: Any) -> float:
+        try:
+            return max(0.0, min(1.0, float(value)))  # Clamp to [0, 1]
+        except (TypeError, ValueError):
+            return 0.5
+
+    @field_validator("reason", "headline", "source_name", "source_country", mode="before")
+    @classmethod
+    def _default_if_missing(cls, value: Any, info: ValidationInfo) -> Any:
+        if value is None:
+            return cls.model_fields[info.field_name].default
+        return value
+
+
+class _LLMBatchItem(_LLMPayload):
+    index: int | None = None
+
+
+class _LLMBatchPayload(BaseModel):
+    results: list[_LLMBatchItem]
+
+
+# ---------- Prompt ----------
+
+_CLASSIFICATION_RULES = """
+Reglas:
+- Marca "IMPORTANT" si hay probabilidad razonable de que el contenido describa
+  un cambio legal/regulatorio, una reforma, un nuevo impuesto, una obligación
+  para empresas o un anuncio oficial de gobierno relevante.
+- Marca "NOT_IMPORTANT" si el contenido es opinión, noticias generales,
+  política sin cambio normativo claro, marketing, o ruido.
+- Sé conservador: no marques IMPORTANT si no estás seguro.
+- Para "headline": resume la idea principal en máximo 10 palabras, como un titular de periódico.
+- Para "source_name": identifica la institución gubernamental, entidad, diario oficial, o fuente que emite la información.
+- Para "source_country": identifica el país basándote en la URL, el contenido, o menciones geográficas.
+""".strip()
+
+
+def _truncate(text: str, limit: int) -> str:
+    """
+    Recorta conservando el inicio y el final: en los diffs el cambio real suele estar al final.
+    """
+    if len(text) <= limit:
+        return text
+    half = (limit - len(_TRUNCATION_MARKER)) // 2
+    return f"{text[:half]}{_TRUNCATION_MARKER}{text[-half:]}"
+
+
+def _snippet_for(change: ChangeInput) -> str:
+    # Pequeño contexto opcional si el diff viene vacío
+    snippet = change.current_snippet or ""
+    if not snippet and change.current_text:
+        snippet = change.current_text[:800]
+    return snippet
+
+
+def _format_change(change: ChangeInput) -> str:
+    """
+    Bloque con los datos de un cambio, compartido por el prompt individual y el de lote.
+    """
+    title = change.title or "(sin título)"
+    url = change.url or "(sin URL)"
+    task_name = change.task_name or "(sin tarea)"
+    timestamp = change.timestamp or "(sin timestamp)"
+    diff_text = _truncate(change.diff_text or "", _MAX_DIFF_CHARS)
+    snippet_fallback = _truncate(_snippet_for(change), _MAX_SNIPPET_CHARS)
+
+    return f"""
+Título: {title}
+URL: {url}
+Tarea: {task_name}
+Fecha/hora: {timestamp}
+
+Cambios detectados (diff):
+\"\"\"{diff_text}\"\"\"
+
+Contexto adicional (snippet de la versión nueva):
+\"\"\"{snippet_fallback}\"\"\"
+""".strip()
+
+
+# Parte fija del prompt: se arma una sola vez al importar el módulo.
+_PROMPT_PREFIX = f"""
+Eres un analista legal y regulatorio que trabaja para ASERTIVA.
+
+Tu tarea es CLASIFICAR si un cambio detectado en una página de noticias o boletín
+es relevante para temas de:
+- leyes
+- reglamentos
+- decretos
+- resoluciones
+- reformas tributarias
+- normativa que pueda afectar a empresas y negocios.
+
+DEBES responder SOLO en JSON con esta estructura:
+
+{{
+  "importance": "IMPORTANT" o "NOT_IMPORTANT",
+  "score": número entre 0 y 1 (confianza de tu clasificación),
+  "reason": "explicación breve en español (máximo 25 palabras) de por qué es relevante o no",
+  "headline": "LA IDEA PRINCIPAL del cambio en máximo 10 palabras (ej: 'Nueva reforma tributaria para comercio exterior')",
+  "source_name": "Nombre de la institución o fuente que emite el contenido (ej: 'Ministerio de Hacienda', 'Corte Suprema de Justicia', 'Diario Oficial')",
+  "source_country": "País de la fuente (ej: 'El Salvador', 'Guatemala', 'Honduras', 'Colombia', 'Perú', 'México')"
+}}
+
+{_CLASSIFICATION_RULES}
+""".strip()
+
+_BATCH_PROMPT_PREFIX = f"""
+Eres un analista legal y regulatorio que trabaja para ASERTIVA.
+
+Tu tarea es CLASIFICAR, uno por uno, si cada cambio detectado en una página de
+noticias o boletín es relevante para temas de:
+- leyes
+- reglamentos
+- decretos
+- resoluciones
+- reformas tributarias
+- normativa que pueda afectar a empresas y negocios.
+
+DEBES responder SOLO en JSON con esta estructura, con un elemento por cambio:
+
+{{
+  "results": [
+    {{
+      "index": número del cambio (el que aparece en "### Cambio N"),
+      "importance": "IMPORTANT" o "NOT_IMPORTANT",
+      "score": número entre 0 y 1 (confianza de tu clasificación),
+      "reason": "explicación breve en español (máximo 25 palabras) de por qué es relevante o no",
+      "headline": "LA IDEA PRINCIPAL del cambio en máximo 10 palabras",
+      "source_name": "Nombre de la institución o fuente que emite el contenido",
+      "source_country": "País de la fuente"
+    }}
+  ]
+}}
+
+{_CLASSIFICATION_RULES}
+- Clasifica cada cambio de forma independiente; no mezcles información entre cambios.
+""".strip()
+
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "Eres un asistente que responde SOLO en JSON válido, sin markdown ni explicaciones adicionales.",
+}
+_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+def _build_prompt(change: ChangeInput) -> str:
+    """
+    Prompt en texto que controla la lógica de negocio.
+    Lo puedes editar cuando cambien los criterios de Asertiva (_PROMPT_PREFIX / _CLASSIFICATION_RULES).
+    """
+    return f"{_PROMPT_PREFIX}\n\nAhora analiza este cambio:\n\n{_format_change(change)}"
+
+
+def _build_batch_prompt(changes: list[ChangeInput]) -> str:
+    """
+    Mismo criterio que _build_prompt, pero para N cambios en una sola llamada.
+    Las instrucciones fijas se envían una vez por lote en lugar de una vez por cambio.
+    """
+    blocks = "\n\n".join(
+        f"### Cambio {i}\n{_format_change(change)}" for i, change in enumerate(changes)
+    )
+    return f"{_BATCH_PROMPT_PREFIX}\n\nAhora analiza estos {len(changes)} cambios:\n\n{blocks}"
+
+
+def _completion_body(prompt: str, max_tokens: int) -> dict[str, Any]:
+    """
+    Parámetros de chat completions; se usan tal cual en la llamada directa y en la Batch API.
+    """
+    return {
+        "model": OPENAI_MODEL,
+        "messages": [_SYSTEM_MESSAGE, {"role": "user", "content": prompt}],
+        "response_format": _RESPONSE_FORMAT,
+        "temperature": _TEMPERATURE,
+        "seed": _SEED,
+        "max_tokens": max_tokens,
+    }
+
+
+PayloadT = TypeVar("PayloadT", bound=BaseModel)
+
+
+def _parse_content(content: str | None, model: type[PayloadT]) -> PayloadT:
+    """
+    Parsea y valida el JSON del modelo en una sola pasada (pydantic-core / jiter).
+    """
+    if not content:
+        raise HTTPException(status_code=500, detail="OpenAI returned empty response")
+
+    try:
+        return model.model_validate_json(content)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI returned invalid JSON: {e.errors()[0]['msg']}. Content: {content[:200]}"
+        )
+
+
+@retry(
+    retry=retry_if_exception_type(_RETRYABLE_OPENAI_ERRORS),
+    wait=wait_random_exponential(min=1, max=30),
+    stop=stop_after_attempt(OPENAI_MAX_ATTEMPTS),
+    reraise=True,
+)
+async def _call_openai(body: dict[str, Any]) -> Any:
+    return await init_client().chat.completions.create(**body)
+
+
+async def _complete(prompt: str, max_tokens: int) -> str | None:
+    """
+    Llama a chat completions en modo JSON y devuelve el contenido crudo.
+    Los errores transitorios se reintentan; un 400 de OpenAI no se reintenta y se propaga como 400.
+    """
+    try:
+        response = await _call_openai(_completion_body(prompt, max_tokens))
+    except BadRequestError as e:
+        raise HTTPException(status_code=400, detail=f"OpenAI rejected the request: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calling OpenAI: {e}")
+
+    return response.choices[0].message.content
+
+
+_OUTPUT_FIELDS = tuple(ChangeOutput.model_fields)
+
+
+def _to_output(payload: _LLMPayload) -> ChangeOutput:
+    """
+    _LLMPayload ya garantiza importance válido y score en [0, 1]: se construye
+    ChangeOutput sin volver a validar ni pasar por model_dump.
+    """
+    return ChangeOutput.model_construct(
+        **{field: getattr(payload, field) for field in _OUTPUT_FIELDS}
+    )
+
+
+# ---------- Cache de clasificaciones ----------
+
+_classification_cache: "OrderedDict[str, tuple[ChangeOutput, float]]" = OrderedDict()
+
+
+def _cache_key(change: ChangeInput) -> str:
+    base = f"{OPENAI_MODEL}|{change.diff_text}|{_snippet_for(change)}"
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> ChangeOutput | None:
+    entry = _classification_cache.get(key)
+    if entry is None:
+        return None
+    output, cached_time = entry
+    if time.time() - cached_time >= CLASSIFICATION_CACHE_TTL_SECONDS:
+        del _classification_cache[key]
+        return None
+    _classification_cache.move_to_end(key)
+    return output
+
+
+def _cache_put(key: str, output: ChangeOutput) -> None:
+    _classification_cache[key] = (output, time.time())
+    _classification_cache.move_to_end(key)
+    while len(_classification_cache) > CLASSIFICATION_CACHE_SIZE:
+        _classification_cache.popitem(last=False)
+
+
+async def classify_with_llm(change: ChangeInput) -> ChangeOutput:
+    """
+    Calls OpenAI chat completions API with JSON mode to get structured classification.
+    Identical diff/snippet pairs are served from the in-process cache.
+    """
+    key = _cache_key(change)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    content = await _complete(_build_prompt(change), max_tokens=_MAX_TOKENS_PER_CLASSIFICATION)
+    output = _to_output(_parse_content(content, _LLMPayload))
+    _cache_put(key, output)
+    return output
+
+
+async def classify_batch_with_llm(changes: list[ChangeInput]) -> list[ChangeOutput]:
+    """
+    Classifies several changes with a single chat completion.
+    Cached changes are answered locally and only the misses are sent to the model.
+    Only classifications the model actually returned are cached: if it left a change
+    out, the call fails naming it and that change is retried on the next request.
+    """
+    keys = [_cache_key(change) for change in changes]
+    outputs: list[ChangeOutput | None] = [_cache_get(key) for key in keys]
+    pending = [i for i, output in enumerate(outputs) if output is None]
+    if not pending:
+        return outputs
+
+    for i, output in zip(pending, await _classify_uncached_batch([changes[i] for i in pending])):
+        if output is not None:
+            outputs[i] = output
+            _cache_put(keys[i], output)
+
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if missing:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI omitted batch results for indices {missing}",
+        )
+    return outputs
+
+
+async def _classify_uncached_batch(changes: list[ChangeInput]) -> list[ChangeOutput | None]:
+    """
+    Results are matched back by "index"; a change the model left out comes back as None.
+    """
+    content = await _complete(
+        _build_batch_prompt(changes),
+        max_tokens=min(_MAX_TOKENS_PER_CLASSIFICATION * len(changes), 8000),
+    )
+    payload = _parse_content(content, _LLMBatchPayload)
+
+    by_index: dict[int, _LLMPayload] = {}
+    for position, result in enumerate(payload.results):
+        index = position if result.index is None else result.index
+        if 0 <= index < len(changes):
+            by_index.setdefault(index, result)
+
+    return [
+        _to_output(by_index[i]) if i in by_index else None for i in range(len(changes))
+    ]
+
+
+# ---------- Batch API ----------
+
+
+async def submit_batch(changes: list[ChangeInput]) -> str:
+    """
+    Sube un JSONL con una solicitud de chat completions por cambio y crea un job
+    de la Batch API (ventana de 24h, mitad de costo). Devuelve el batch_id.
+    custom_id es la posición del cambio en la lista original.
+    """
+    lines = [
+        json.dumps(
+            {
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": _completion_body(_build_prompt(change), max_tokens=_MAX_TOKENS_PER_CLASSIFICATION),
+            },
+            ensure_ascii=False,
+        )
+        for i, change in enumerate(changes)
+    ]
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+
+    try:
+        batch_file = await init_client().files.create(
+            file=("classify_batch.jsonl", payload),
+            purpose="batch",
+        )
+        batch = await init_client().batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating OpenAI batch: {e}")
+
+    return batch.id
+
+
+def _parse_batch_output(output: str, total: int) -> list[ChangeOutput | None]:
+    """
+    Convierte el JSONL de salida de la Batch API en resultados ordenados por custom_id.
+    Las solicitudes que fallaron (o cuya línea no es JSON válido) quedan como None.
+    """
+    items: list[ChangeOutput | None] = [None] * total
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        try:
+            index = int(record.get("custom_id"))
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= index < total:
+            continue
+
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            continue
+
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            items[index] = _to_output(_parse_content(content, _LLMPayload))
+        except (KeyError, IndexError, TypeError, HTTPException):
+            continue
+    return items
+
+
+async def retrieve_batch(batch_id: str) -> tuple[str, list[ChangeOutput | None] | None]:
+    """
+    Estado de un job de la Batch API y, si está "completed", sus resultados
+    en el mismo orden en que se enviaron los cambios.
+    """
+    try:
+        batch = await init_client().batches.retrieve(batch_id)
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Batch no encontrado: {e}")
+    except BadRequestError as e:
+        raise HTTPException(status_code=400, detail=f"OpenAI rejected the request: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving OpenAI batch: {e}")
+
+    if batch.status != "completed" or not batch.output_file_id:
+        return batch.status, None
+
+    try:
+        output = await init_client().files.content(batch.output_file_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error downloading batch output: {e}")
+
+    total = batch.request_counts.total if batch.request_counts else 0
+    return batch.status, _parse_batch_output(output.text, total)
@@ -1,44 +1,107 @@
-import json
+import asyncio
+import logging
 import os
-from typing import Literal
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
-from openai import OpenAI
+
+from .classifier import (
+    MAX_BATCH_ITEMS,
+    OPENAI_MODEL,
+    ChangeInput,
+    ChangeOutput,
+    classify_batch_with_llm,
+    classify_with_llm,
+    close_client,
+    init_client,
+    retrieve_batch,
+    submit_batch,
+)
+
+logger = logging.getLogger("ai_filter")
 
 # ---------- Config ----------
 
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Límite de solicitudes por archivo de la Batch API de OpenAI
+MAX_ASYNC_BATCH_ITEMS = 50_000
+# /classify/many: una llamada por cambio, con como máximo N llamadas a OpenAI en vuelo
+MAX_MANY_ITEMS = 500
+CLASSIFY_MANY_CONCURRENCY = int(os.getenv("CLASSIFY_MANY_CONCURRENCY", "10"))
+
+# ---------- Esquemas de los endpoints ----------
+
+class BatchIn(BaseModel):
+    items: list[ChangeInput] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class BatchOut(BaseModel):
+    items: list[ChangeOutput]
+
+
+class ManyIn(BaseModel):
+    items: list[ChangeInput] = Field(min_length=1, max_length=MAX_MANY_ITEMS)
+
+
+class ManyResult(BaseModel):
+    index: int
+    # Exactamente uno de los dos: la clasificación o el error de ese cambio
+    result: ChangeOutput | None = None
+    error: str | None = None
+
 
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY no está definida en el entorno")
+class ManyOut(BaseModel):
+    items: list[ManyResult]
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 
-# ---------- Esquemas ----------
+class AsyncBatchIn(BaseModel):
+    items: list[ChangeInput] = Field(min_length=1, max_length=MAX_ASYNC_BATCH_ITEMS)
 
-class ChangeInput(BaseModel):
-    title: str | None = None
-    diff_text: str
-    current_snippet: str | None = None
-    previous_text: str | None = None
-    current_text: str | None = None
-    url: str | None = None
-    task_name: str | None = None
-    timestamp: str | None = None
 
+class AsyncBatchSubmitted(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+
+
+class AsyncBatchStatus(BaseModel):
+    batch_id: str
+    status: str
+    # Solo cuando status == "completed"; None en las posiciones que fallaron
+    items: list[ChangeOutput | None] | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque: valida la API key, crea el cliente de OpenAI y calienta lo que de otro
+    modo pagaría la primera petición (validadores de pydantic, conexión TLS a OpenAI).
+    """
+    openai_client = init_client()
+
+    ChangeInput.model_validate({"diff_text": ""})
+    ChangeOutput.model_validate(
+        {
+            "importance": "NOT_IMPORTANT",
+            "score": 0.0,
+            "reason": "",
+            "headline": "",
+            "source_name": "",
+            "source_country": "",
+        }
+    )
+    try:
+        await openai_client.models.retrieve(OPENAI_MODEL)
+    except Exception as e:
+        # Solo es un warm-up: OpenAI caído no debe impedir que arranque el servicio
+        logger.warning("No se pudo precalentar la conexión con OpenAI: %s", e)
+
+    yield
 
-class ChangeOutput(BaseModel):
-    importance: Literal["IMPORTANT", "NOT_IMPORTANT"]
-    score: float = Field(ge=0.0, le=1.0)
-    reason: str
-    headline: str = Field(description="Idea principal en máximo 10 palabras")
-    source_name: str = Field(description="Nombre de la institución o fuente que emite el comunicado")
-    source_country: str = Field(description="País de la fuente (El Salvador, Guatemala, Honduras, Colombia, Perú, México, etc.)")
+    await close_client()
 
 
-app = FastAPI(title="AI Filter Service")
+app = FastAPI(title="AI Filter Service", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -46,132 +109,70 @@ def health():
     return {"status": "ok", "model": OPENAI_MODEL}
 
 
-def _build_prompt(change: ChangeInput) -> str:
+@app.post("/classify", response_model=ChangeOutput)
+async def classify_change(change: ChangeInput):
     """
-    Prompt en texto que controla la lógica de negocio.
-    Lo puedes editar cuando cambien los criterios de Asertiva.
+    Endpoint usado por filter-worker.
     """
-    title = change.title or "(sin título)"
-    url = change.url or "(sin URL)"
-    task_name = change.task_name or "(sin tarea)"
-    timestamp = change.timestamp or "(sin timestamp)"
-    diff_text = change.diff_text or ""
-    current_snippet = change.current_snippet or ""
-    # Pequeño contexto opcional si el diff viene vacío
-    snippet_fallback = current_snippet
-    if not snippet_fallback and change.current_text:
-        snippet_fallback = (change.current_text or "")[:800]
-
-    return f"""
-Eres un analista legal y regulatorio que trabaja para ASERTIVA.
-
-Tu tarea es CLASIFICAR si un cambio detectado en una página de noticias o boletín
-es relevante para temas de:
-- leyes
-- reglamentos
-- decretos
-- resoluciones
-- reformas tributarias
-- normativa que pueda afectar a empresas y negocios.
-
-DEBES responder SOLO en JSON con esta estructura:
-
-{{
-  "importance": "IMPORTANT" o "NOT_IMPORTANT",
-  "score": número entre 0 y 1 (confianza de tu clasificación),
-  "reason": "explicación breve en español de por qué es relevante o no",
-  "headline": "LA IDEA PRINCIPAL del cambio en máximo 10 palabras (ej: 'Nueva reforma tributaria para comercio exterior')",
-  "source_name": "Nombre de la institución o fuente que emite el contenido (ej: 'Ministerio de Hacienda', 'Corte Suprema de Justicia', 'Diario Oficial')",
-  "source_country": "País de la fuente (ej: 'El Salvador', 'Guatemala', 'Honduras', 'Colombia', 'Perú', 'México')"
-}}
-
-Reglas:
-- Marca "IMPORTANT" si hay probabilidad razonable de que el contenido describa
-  un cambio legal/regulatorio, una reforma, un nuevo impuesto, una obligación
-  para empresas o un anuncio oficial de gobierno relevante.
-- Marca "NOT_IMPORTANT" si el contenido es opinión, noticias generales,
-  política sin cambio normativo claro, marketing, o ruido.
-- Sé conservador: no marques IMPORTANT si no estás seguro.
-- Para "headline": resume la idea principal en máximo 10 palabras, como un titular de periódico.
-- Para "source_name": identifica la institución gubernamental, entidad, diario oficial, o fuente que emite la información.
-- Para "source_country": identifica el país basándote en la URL, el contenido, o menciones geográficas.
-
-Ahora analiza este cambio:
-
-Título: {title}
-URL: {url}
-Tarea: {task_name}
-Fecha/hora: {timestamp}
-
-Cambios detectados (diff):
-\"\"\"{diff_text}\"\"\"
-
-Contexto adicional (snippet de la versión nueva):
-\"\"\"{snippet_fallback}\"\"\"
-""".strip()
-
-
-def classify_with_llm(change: ChangeInput) -> ChangeOutput:
+    return await classify_with_llm(change)
+
+
+@app.post("/classify/batch", response_model=BatchOut)
+async def classify_changes_batch(batch: BatchIn):
     """
-    Calls OpenAI chat completions API with JSON mode to get structured classification.
+    Clasifica hasta MAX_BATCH_ITEMS cambios en una sola llamada al modelo.
+    Los resultados se devuelven en el mismo orden que los items recibidos.
     """
-    prompt = _build_prompt(change)
+    return BatchOut(items=await classify_batch_with_llm(batch.items))
 
-    try:
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Eres un asistente que responde SOLO en JSON válido, sin markdown ni explicaciones adicionales."
-                },
-                {"role": "user", "content": prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3,
-            max_tokens=500,
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error calling OpenAI: {e}")
 
-    # Parse the JSON response
-    content = response.choices[0].message.content
-    if not content:
-        raise HTTPException(status_code=500, detail="OpenAI returned empty response")
+# Compartido entre peticiones: acota el total de llamadas concurrentes a OpenAI (RPM)
+_many_semaphore = asyncio.Semaphore(CLASSIFY_MANY_CONCURRENCY)
 
-    try:
-        parsed = json.loads(content)
-    except json.JSONDecodeError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"OpenAI returned invalid JSON: {e}. Content: {content[:200]}"
-        )
-
-    # Extract and validate fields with defaults
-    importance = parsed.get("importance", "NOT_IMPORTANT")
-    if importance not in ("IMPORTANT", "NOT_IMPORTANT"):
-        importance = "NOT_IMPORTANT"
-
-    score = parsed.get("score", 0.5)
-    try:
-        score = float(score)
-        score = max(0.0, min(1.0, score))  # Clamp to [0, 1]
-    except (TypeError, ValueError):
-        score = 0.5
-
-    return ChangeOutput(
-        importance=importance,
-        score=score,
-        reason=parsed.get("reason", "Sin análisis disponible"),
-        headline=parsed.get("headline", "Actualización regulatoria"),
-        source_name=parsed.get("source_name", "Fuente no identificada"),
-        source_country=parsed.get("source_country", "País no identificado"),
+
+async def _classify_bounded(change: ChangeInput) -> ChangeOutput:
+    async with _many_semaphore:
+        return await classify_with_llm(change)
+
+
+@app.post("/classify/many", response_model=ManyOut)
+async def classify_changes_many(batch: ManyIn):
+    """
+    Clasifica cada cambio con su propia llamada (mismo prompt que /classify), en paralelo
+    con hasta CLASSIFY_MANY_CONCURRENCY llamadas en vuelo. Un fallo no tumba el lote:
+    ese índice vuelve con "error" y el resto con su "result".
+    """
+    outcomes = await asyncio.gather(
+        *(_classify_bounded(change) for change in batch.items),
+        return_exceptions=True,
     )
 
+    items: list[ManyResult] = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, HTTPException):
+            items.append(ManyResult(index=index, error=str(outcome.detail)))
+        elif isinstance(outcome, Exception):
+            items.append(ManyResult(index=index, error=str(outcome)))
+        else:
+            items.append(ManyResult(index=index, result=outcome))
+    return ManyOut(items=items)
 
-@app.post("/classify", response_model=ChangeOutput)
-def classify_change(change: ChangeInput):
+
+@app.post("/classify/async_batch", response_model=AsyncBatchSubmitted)
+async def submit_async_batch(batch: AsyncBatchIn):
     """
-    Endpoint usado por filter-worker.
+    Envía los cambios a la Batch API de OpenAI para clasificaciones no urgentes
+    (backfills, reclasificaciones). Consultar el resultado en GET /classify/batch/{batch_id}.
+    """
+    batch_id = await submit_batch(batch.items)
+    return AsyncBatchSubmitted(batch_id=batch_id, status="submitted", total=len(batch.items))
+
+
+@app.get("/classify/batch/{batch_id}", response_model=AsyncBatchStatus)
+async def get_async_batch(batch_id: str):
+    """
+    Estado de un job de la Batch API. Cuando está "completed" incluye los
+    resultados en el mismo orden en que se enviaron los cambios.
     """
-    return classify_with_llm(change)
+    status, items = await retrieve_batch(batch_id)
+    return AsyncBatchStatus(batch_id=batch_id, status=status, items=items)
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import sys
+from types import SimpleNamespace
+from pathlib import Path
+import unittest
+from unittest import mock
+
+import httpx
+from fastapi import HTTPException
+from openai import APITimeoutError, NotFoundError
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+sys.modules.pop("app", None)
+
+from app import classifier  # noqa: E402
+from app.classifier import ChangeInput  # noqa: E402
+
+
+def batch_reply(*indices: int) -> str:
+    # Respuesta del modelo a _build_batch_prompt con un resultado por índice
+    return json.dumps(
+        {
+            "results": [
+                {
+                    "index": i,
+                    "importance": "IMPORTANT",
+                    "score": 0.9,
+                    "reason": f"Cambio {i}",
+                    "headline": "Reforma",
+                    "source_name": "Ministerio de Hacienda",
+                    "source_country": "El Salvador",
+                }
+                for i in indices
+            ]
+        }
+    )
+
+
+class ClassifyBatchCacheTest(unittest.TestCase):
+    def setUp(self):
+        classifier._classification_cache.clear()
+        self.addCleanup(classifier._classification_cache.clear)
+
+    def test_missing_index_fails_and_is_not_cached(self):
+        changes = [ChangeInput(diff_text="+Nuevo decreto"), ChangeInput(diff_text="+Otro cambio")]
+        with mock.patch.object(classifier, "_complete", mock.AsyncMock(return_value=batch_reply(0))):
+            with self.assertRaises(HTTPException) as ctx:
+                asyncio.run(classifier.classify_batch_with_llm(changes))
+
+        self.assertEqual(ctx.exception.status_code, 500)
+        self.assertIn("[1]", ctx.exception.detail)
+        # Lo que el modelo sí devolvió se guarda; el cambio omitido no
+        self.assertEqual(classifier._cache_get(classifier._cache_key(changes[0])).reason, "Cambio 0")
+        self.assertIsNone(classifier._cache_get(classifier._cache_key(changes[1])))
+
+    def test_complete_batch_is_cached(self):
+        changes = [ChangeInput(diff_text="+Nuevo decreto"), ChangeInput(diff_text="+Otro cambio")]
+        complete = mock.AsyncMock(return_value=batch_reply(1, 0))
+        with mock.patch.object(classifier, "_complete", complete):
+            outputs = asyncio.run(classifier.classify_batch_with_llm(changes))
+            # Segunda vez: todo sale de la cache, sin llamar al modelo
+            self.assertEqual(asyncio.run(classifier.classify_batch_with_llm(changes)), outputs)
+
+        self.assertEqual([output.reason for output in outputs], ["Cambio 0", "Cambio 1"])
+        self.assertEqual(complete.await_count, 1)
+
+
+def batch_output_line(custom_id: str, content: str) -> str:
+    # Línea del JSONL de salida de la Batch API con una respuesta 200
+    return json.dumps(
+        {
+            "custom_id": custom_id,
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": content}}]},
+            },
+            "error": None,
+        }
+    )
+
+
+BATCH_OUTPUT_FIXTURE = "\n".join(
+    [
+        batch_output_line("0", json.dumps({"importance": "IMPORTANT", "score": 0.8, "reason": "Decreto"})),
+        json.dumps({"custom_id": "1", "response": None, "error": {"code": "server_error", "message": "boom"}}),
+        '{"custom_id": "2", "response": {"status_code": 200, "body": ',
+        batch_output_line("3", json.dumps({"importance": "NOT_IMPORTANT", "score": 0.1, "reason": "Ruido"})),
+    ]
+)
+
+
+class BatchOutputTest(unittest.TestCase):
+    def test_error_and_malformed_lines_are_skipped(self):
+        items = classifier._parse_batch_output(BATCH_OUTPUT_FIXTURE, total=4)
+
+        self.assertEqual(items[0].reason, "Decreto")
+        self.assertIsNone(items[1])
+        self.assertIsNone(items[2])
+        self.assertEqual(items[3].importance, "NOT_IMPORTANT")
+
+    def test_retrieve_maps_only_not_found_to_404(self):
+        request = httpx.Request("GET", "https://api.openai.com/v1/batches/batch_x")
+        not_found = NotFoundError("No batch", response=httpx.Response(404, request=request), body=None)
+        for error, status_code in ((not_found, 404), (APITimeoutError(request=request), 500)):
+            openai_client = SimpleNamespace(
+                batches=SimpleNamespace(retrieve=mock.AsyncMock(side_effect=error))
+            )
+            with mock.patch.object(classifier, "init_client", return_value=openai_client):
+                with self.assertRaises(HTTPException) as ctx:
+                    asyncio.run(classifier.retrieve_batch("batch_x"))
+            self.assertEqual(ctx.exception.status_code, status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
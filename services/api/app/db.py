@@ -1,19 +1,55 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+
+import orjson
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL no está definida en el entorno")
 
-engine = create_engine(DATABASE_URL, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# Drivers async equivalentes a las URLs sync que usan los demás servicios
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Maps the shared DATABASE_URL (postgresql://, postgresql+psycopg2://, sqlite://)
+    to the async driver used by the API.
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# Conexiones por proceso: con sesiones async una sola instancia atiende muchas
+# peticiones a la vez, el pool por defecto (5 + 10) se queda corto
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def engine_options(url: str) -> dict:
+    """Pool sizing only for Postgres; SQLite keeps SQLAlchemy's default pool."""
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+
+
+# asyncpg decodifica JSON/JSONB en el propio driver con este deserializer
+engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    json_deserializer=orjson.loads,
+    **engine_options(DATABASE_URL),
+)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,213 @@
+import re
+import zlib
+
+from diff_match_patch import diff_match_patch
+
+# Límite de tiempo de diff_main: pasado este tiempo devuelve un diff válido pero menos mínimo
+DIFF_TIMEOUT_SECONDS = 1.0
+# Líneas de contexto alrededor de cada cambio (como difflib.unified_diff, n=3)
+CONTEXT_LINES = 3
+# Líneas más largas que esto (HTML minificado, base64) se parten en trozos de
+# ~LONG_LINE_CHUNK caracteres: un cambio pequeño no arrastra toda la línea al diff
+LONG_LINE_THRESHOLD = 2000
+LONG_LINE_CHUNK = 200
+# Zona cambiada (tras recortar prefijo/sufijo comunes) más grande que esto, o con un
+# lado REPLACE_RATIO veces más largo que el otro: se emite "borrar todo / insertar
+# todo" sin diffear (Myers gastaría el timeout entero para un diff igual de ilegible)
+REPLACE_ALL_CHARS = 200_000
+REPLACE_ALL_RATIO = 10
+REPLACE_ALL_MIN_LINES = 1000
+
+# Palabra con sus espacios previos; corte tras ~1 de cada 8 palabras
+_WORD_RE = re.compile(r"\s*\S+")
+_CUT_MASK = 0b111
+
+_PREFIXES = {
+    diff_match_patch.DIFF_EQUAL: " ",
+    diff_match_patch.DIFF_DELETE: "-",
+    diff_match_patch.DIFF_INSERT: "+",
+}
+
+
+def _split_long_line(line: str) -> list[str]:
+    """
+    Parte una línea larga en trozos de LONG_LINE_CHUNK/2 a 2*LONG_LINE_CHUNK caracteres.
+    Los cortes dependen del contenido (tras una palabra cuyo crc32 cumple _CUT_MASK), no
+    de la posición: insertar o borrar texto solo cambia el trozo afectado, los siguientes
+    vuelven a cortarse en los mismos sitios y el diff no se desplaza.
+    """
+    min_len, max_len = LONG_LINE_CHUNK // 2, LONG_LINE_CHUNK * 2
+    chunks: list[str] = []
+    current = ""
+    for word in _WORD_RE.findall(line):
+        # Palabra enorme sin espacios (base64): se corta por posición
+        while len(word) > max_len:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(word[:LONG_LINE_CHUNK])
+            word = word[LONG_LINE_CHUNK:]
+        current += word
+        if len(current) >= max_len or (
+            len(current) >= min_len and zlib.crc32(word.encode()) & _CUT_MASK == 0
+        ):
+            chunks.append(current)
+            current = ""
+    # Espacios finales que _WORD_RE no recoge
+    current += line[len("".join(chunks)) + len(current):]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_lines(text: str) -> list[str]:
+    lines = text.splitlines()
+    if max(map(len, lines), default=0) <= LONG_LINE_THRESHOLD:
+        return lines
+    split: list[str] = []
+    for line in lines:
+        if len(line) > LONG_LINE_THRESHOLD:
+            split.extend(_split_long_line(line))
+        else:
+            split.append(line)
+    return split
+
+
+def _common_affix(prev_lines: list[str], curr_lines: list[str]) -> tuple[int, int]:
+    """Number of identical leading and trailing lines (without overlapping)."""
+    limit = min(len(prev_lines), len(curr_lines))
+    prefix = 0
+    while prefix < limit and prev_lines[prefix] == curr_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < limit - prefix
+        and prev_lines[len(prev_lines) - 1 - suffix] == curr_lines[len(curr_lines) - 1 - suffix]
+    ):
+        suffix += 1
+    return prefix, suffix
+
+
+def _format_range(start: int, length: int) -> str:
+    """Rango de un hunk en formato unified (mismo criterio que difflib)."""
+    beginning = start + 1
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def _replace_all(prev_lines: list[str], curr_lines: list[str]) -> bool:
+    """Whether the changed region is too big or too lopsided to be worth diffing."""
+    shorter, longer = sorted((len(prev_lines), len(curr_lines)))
+    if longer >= REPLACE_ALL_MIN_LINES and longer > REPLACE_ALL_RATIO * shorter:
+        return True
+    return sum(map(len, prev_lines)) + sum(map(len, curr_lines)) > REPLACE_ALL_CHARS
+
+
+def _line_ops(prev: str, curr: str, timeout: float) -> list[tuple[str, str]]:
+    """
+    Diff por líneas con diff-match-patch (Myers O(ND), con timeout): cada línea se
+    codifica como un carácter, se diffea y se decodifica de vuelta a líneas.
+    Las líneas iguales al principio y al final (lo normal en una página que cambia
+    en un solo sitio) se recortan antes, así solo se codifica la zona que cambió.
+    """
+    prev_lines = _split_lines(prev)
+    curr_lines = _split_lines(curr)
+
+    # Un lado vacío: todo es inserción o borrado, no hace falta diffear
+    if not prev_lines:
+        return [("+", line) for line in curr_lines]
+    if not curr_lines:
+        return [("-", line) for line in prev_lines]
+
+    prefix, suffix = _common_affix(prev_lines, curr_lines)
+    prev_mid = prev_lines[prefix:len(prev_lines) - suffix]
+    curr_mid = curr_lines[prefix:len(curr_lines) - suffix]
+
+    if not prev_mid or not curr_mid or _replace_all(prev_mid, curr_mid):
+        middle = [("-", line) for line in prev_mid] + [("+", line) for line in curr_mid]
+    else:
+        dmp = diff_match_patch()
+        dmp.Diff_Timeout = timeout
+
+        # Toda línea termina en "\n": "a\nb" y "a\nb\n" no cuentan como cambio
+        prev_chars, curr_chars, line_array = dmp.diff_linesToChars(
+            "".join(f"{line}\n" for line in prev_mid),
+            "".join(f"{line}\n" for line in curr_mid),
+        )
+        # Sin diff_cleanupSemantic: en modo línea absorbe líneas iguales sueltas entre
+        # cambios y el diff queda más ruidoso que el de difflib
+        diffs = dmp.diff_main(prev_chars, curr_chars, False)
+        dmp.diff_charsToLines(diffs, line_array)
+        middle = [
+            (_PREFIXES[op], line)
+            for op, data in diffs
+            for line in data.splitlines()
+        ]
+
+    return (
+        [(" ", line) for line in prev_lines[:prefix]]
+        + middle
+        + [(" ", line) for line in prev_lines[len(prev_lines) - suffix:]]
+    )
+
+
+def compute_diff(prev: str, curr: str, timeout: float = DIFF_TIMEOUT_SECONDS) -> str | None:
+    """
+    Compute a unified diff between previous and current text.
+    Same output format as difflib.unified_diff(fromfile="previous", tofile="current"),
+    so stored diff_text values stay compatible. Past timeout seconds the diff is still
+    valid but may mark more lines as changed than strictly needed.
+    """
+    # Caso más común: Wachete reenvía el mismo contenido
+    if prev == curr:
+        return None
+
+    ops = _line_ops(prev, curr, timeout)
+    changed = [i for i, (prefix, _) in enumerate(ops) if prefix != " "]
+    if not changed:
+        return None
+
+    # Posición (0-based) en previous/current al inicio de cada op
+    old_pos: list[int] = []
+    new_pos: list[int] = []
+    old_line = new_line = 0
+    for prefix, _ in ops:
+        old_pos.append(old_line)
+        new_pos.append(new_line)
+        if prefix != "+":
+            old_line += 1
+        if prefix != "-":
+            new_line += 1
+    old_pos.append(old_line)
+    new_pos.append(new_line)
+
+    # Agrupa cambios separados por <= 2 * CONTEXT_LINES líneas iguales en un mismo hunk
+    groups: list[tuple[int, int]] = []
+    start = end = changed[0]
+    for i in changed[1:]:
+        if i - end - 1 > 2 * CONTEXT_LINES:
+            groups.append((start, end))
+            start = i
+        end = i
+    groups.append((start, end))
+
+    out = ["--- previous", "+++ current"]
+    for start, end in groups:
+        lo = max(0, start - CONTEXT_LINES)
+        hi = min(len(ops), end + CONTEXT_LINES + 1)
+        old_range = _format_range(old_pos[lo], old_pos[hi] - old_pos[lo])
+        new_range = _format_range(new_pos[lo], new_pos[hi] - new_pos[lo])
+        out.append(f"@@ -{old_range} +{new_range} @@")
+        out.extend(f"{prefix}{line}" for prefix, line in ops[lo:hi])
+
+    return "\n".join(out)
+
+
+def compute_diffs(
+    pairs: list[tuple[str, str]], timeout: float = DIFF_TIMEOUT_SECONDS
+) -> list[str | None]:
+    """compute_diff for a batch of (prev, curr): one round-trip to a worker process."""
+    return [compute_diff(prev, curr, timeout) for prev, curr in pairs]
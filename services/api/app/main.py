@@ -1,25 +1,79 @@
-import difflib
+import asyncio
 import hashlib
-import json
 import logging
 import os
 import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import date, datetime, timedelta
-from typing import Any, Optional
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Literal, Optional
 
-from fastapi import Depends, FastAPI, Header, HTTPException
+import orjson
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import text
+from sqlalchemy import Date, TextClause, bindparam, text
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 
-from .db import get_db
+from .db import SessionLocal, get_db
+from .diff_utils import DIFF_TIMEOUT_SECONDS, compute_diff, compute_diffs
 
 # Ingestion API token (set via environment variable)
 INGEST_API_TOKEN = os.getenv("INGEST_API_TOKEN", "")
 
-app = FastAPI(title="Asertiva Monitoring API")
+
+def _orjson_default(value: Any) -> Any:
+    # Solo se llama para tipos que orjson no soporta: NUMERIC de Postgres, BYTEA
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode(errors="replace")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (datetimes as ISO 8601, no stdlib json pass)."""
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque: carga la cache de columnas de wachet_changes y construye el SQL del
+    listado sin filtros (el que pide el dashboard al abrir), para que la primera
+    petición no pague ni la consulta al esquema ni el armado de la query.
+    Cierre: para el pool de diffs.
+    """
+    # get_existing_columns no cachea un fallo: si la DB no está lista, se reintenta
+    # en la primera petición
+    async with SessionLocal() as db:
+        existing_columns = await get_existing_columns(db)
+    if existing_columns:
+        _list_statement(_build_list_query(existing_columns), LIST_STREAM_CHUNK_ROWS)
+
+    yield
+
+    if _diff_pool is not None:
+        _diff_pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(
+    title="Asertiva Monitoring API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 logger = logging.getLogger("wachet_changes")
 if not logger.handlers:
@@ -36,6 +90,10 @@ app.add_middleware(
 
 # Estados permitidos
 ALLOWED_STATUSES = {"NEW", "PENDING", "FILTERED", "VALIDATED", "PUBLISHED", "DISCARDED"}
+# Filtros de los listados: valores fuera de estos dan 422 sin llegar a la DB.
+# ERROR lo pone filter-worker (no se asigna por PATCH) pero sí se puede listar
+StatusFilter = Literal["NEW", "PENDING", "FILTERED", "VALIDATED", "PUBLISHED", "DISCARDED", "ERROR"]
+ImportanceFilter = Literal["IMPORTANT", "NOT_IMPORTANT"]
 OPTIONAL_CHANGE_COLUMNS = ("headline", "source_name", "source_country")
 # Diff columns added by migration 002 - may be missing in older DBs
 OPTIONAL_DIFF_COLUMNS = ("previous_text", "current_text", "diff_text")
@@ -43,6 +101,22 @@ OPTIONAL_DIFF_COLUMNS = ("previous_text", "current_text", "diff_text")
 OPTIONAL_WATCHGUARD_COLUMNS = ("source", "content_hash", "fetch_mode", "snapshot_ref", "fetched_at")
 # Valid source values
 VALID_SOURCES = {"wachete", "watchguard", "manual"}
+# Filas por lote al leer los listados con cursor de servidor
+LIST_STREAM_CHUNK_ROWS = 50
+# Diffs de los listados: procesos en paralelo a partir de DIFF_POOL_MIN_CHARS de texto
+DIFF_POOL_WORKERS = int(os.getenv("DIFF_POOL_WORKERS", str(os.cpu_count() or 1)))
+DIFF_POOL_MIN_CHARS = 50_000
+# Por encima de esto (previous + current) el listado no calcula el diff de la fila
+LIST_DIFF_MAX_CHARS = 500_000
+# Timeout de diff_main por fila en el listado (ingest usa el de diff_utils, 1 s): con
+# 500 filas por página el peor caso queda acotado a segundos, no minutos
+LIST_DIFF_TIMEOUT_SECONDS = 0.1
+# Diffs del listado ya calculados, por hash de (previous, current): filas que no se
+# pueden guardar (sin migración 002) o aún sin backfill no se rediffean en cada carga.
+# Acotada por tamaño total (caracteres de diff), no por entradas: un diff de
+# LIST_DIFF_MAX_CHARS puede ocupar cientos de KB. Los diffs grandes no se guardan
+DIFF_CACHE_MAX_CHARS = 32_000_000
+DIFF_CACHE_MAX_DIFF_CHARS = 64_000
 
 # ---------- Response Models (API Contract) ----------
 
@@ -85,6 +159,9 @@ class WachetChangesResponse(BaseModel):
 
     items: list[WachetChangeItem]
     total: int
+    # Keyset: pasar como cursor / cursor_id para pedir la página siguiente (None = última)
+    next_cursor: Optional[datetime] = None
+    next_cursor_id: Optional[int] = None
 
 
 class SummaryItem(BaseModel):
@@ -99,6 +176,8 @@ class SummaryResponse(BaseModel):
     """Response for /wachet-changes/summary endpoint."""
 
     items: list[SummaryItem]
+    # Sum of all items (same value as /wachet-changes/count)
+    total: int = 0
 
 
 class HealthResponse(BaseModel):
@@ -127,6 +206,8 @@ class UpdateResponse(BaseModel):
     ok: bool
     id: int
     status: str
+    # Updated row, so clients can refresh it without a second request
+    item: Optional[WachetChangeItem] = None
 
 
 
@@ -159,62 +240,106 @@ class AlertStatItem(BaseModel):
 
 # ---------- Column Cache ----------
 
-_columns_cache: dict[str, tuple[set[str], float]] = {}
-_CACHE_TTL_SECONDS = 300  # 5 minutes
+# Por dialecto, sin TTL: el esquema solo cambia con una migración (reiniciar la API
+# o llamar a POST /columns-cache/clear después de aplicarla)
+_columns_cache: dict[str, frozenset[str]] = {}
+# Un solo lector del esquema a la vez: peticiones concurrentes con la cache vacía
+# (tras /columns-cache/clear o con la tabla aún sin crear) esperan a esa lectura
+_columns_lock = asyncio.Lock()
 
 
-def get_existing_columns(db: Session, use_cache: bool = True) -> set[str]:
+async def get_existing_columns(db: AsyncSession, use_cache: bool = True) -> frozenset[str]:
     """
     Returns the column names for wachet_changes in the current DB.
     Supports PostgreSQL (information_schema) and SQLite (PRAGMA).
-    Results are cached for _CACHE_TTL_SECONDS to avoid repeated schema queries.
+    Results are cached per dialect until the process restarts or the cache is cleared.
     """
-    global _columns_cache
-
     dialect = db.bind.dialect.name if db.bind else "unknown"
-    cache_key = f"wachet_changes_{dialect}"
 
-    # Check cache
-    if use_cache and cache_key in _columns_cache:
-        cached_cols, cached_time = _columns_cache[cache_key]
-        if time.time() - cached_time < _CACHE_TTL_SECONDS:
-            return cached_cols
+    if use_cache:
+        cached = _columns_cache.get(dialect)
+        if cached is not None:
+            return cached
 
+    async with _columns_lock:
+        # Otra petición pudo llenarla mientras esperábamos el lock
+        cached = _columns_cache.get(dialect) if use_cache else None
+        if cached is not None:
+            return cached
+        return await _read_existing_columns(db, dialect)
+
+
+async def _read_existing_columns(db: AsyncSession, dialect: str) -> frozenset[str]:
     try:
         if dialect == "sqlite":
-            rows = db.execute(text("PRAGMA table_info('wachet_changes')")).all()
-            cols = {row[1] for row in rows}
+            rows = (await db.execute(text("PRAGMA table_info('wachet_changes')"))).all()
+            cols = frozenset(row[1] for row in rows)
         else:
-            rows = db.execute(
-                text(
-                    """
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_schema = current_schema()
-                      AND table_name = 'wachet_changes'
-                    """
+            rows = (
+                await db.execute(
+                    text(
+                        """
+                        SELECT column_name
+                        FROM information_schema.columns
+                        WHERE table_schema = current_schema()
+                          AND table_name = 'wachet_changes'
+                        """
+                    )
                 )
             ).scalars()
-            cols = set(rows)
+            cols = frozenset(rows)
 
-        # Update cache
-        _columns_cache[cache_key] = (cols, time.time())
+        # Sin columnas = la tabla aún no existe: no se cachea para volver a mirar
+        if cols:
+            _columns_cache[dialect] = cols
         return cols
     except Exception:
         logger.exception("No se pudieron leer las columnas de wachet_changes")
-        return set()
+        return frozenset()
+
+
+# Sentencias fijas que el dashboard repite en cada refresco: se construyen una
+# vez (text() no vuelve a parsear los bind params) y comparten la cache de compilado
+_PING_STMT = text("SELECT 1")
+_SUMMARY_COUNTERS_STMT = text(
+    """
+    SELECT
+      NULLIF(status, '') AS status,
+      NULLIF(importance, '') AS importance,
+      total
+    FROM wachet_changes_counters
+    WHERE total > 0
+    ORDER BY 1, 2
+    """
+)
+_SUMMARY_GROUP_BY_STMT = text(
+    """
+    SELECT
+      status,
+      importance,
+      COUNT(*) AS total
+    FROM wachet_changes
+    GROUP BY status, importance
+    ORDER BY status, importance
+    """
+)
+_COUNT_COUNTERS_STMT = text("SELECT COALESCE(SUM(total), 0) FROM wachet_changes_counters")
+_COUNT_ESTIMATE_STMT = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = 'wachet_changes'::regclass"
+)
+_COUNT_EXACT_STMT = text("SELECT COUNT(*) FROM wachet_changes")
 
 
 @app.get("/health", response_model=HealthResponse)
-def health():
+async def health():
     return HealthResponse(status="ok", version="1.0.0")
 
 
 @app.get("/db-health", response_model=DbHealthResponse)
-def db_health(db: Session = Depends(get_db)):
+async def db_health(db: AsyncSession = Depends(get_db)):
     start = time.time()
     try:
-        result = db.execute(text("SELECT 1")).scalar()
+        result = (await db.execute(_PING_STMT)).scalar()
         latency_ms = (time.time() - start) * 1000
         return DbHealthResponse(db_ok=bool(result), latency_ms=round(latency_ms, 2))
     except Exception:
@@ -222,135 +347,212 @@ def db_health(db: Session = Depends(get_db)):
         return DbHealthResponse(db_ok=False, latency_ms=round(latency_ms, 2))
 
 
-@app.get("/wachet-changes/count", response_model=CountResponse)
-def count_wachet_changes(db: Session = Depends(get_db)):
-    result = db.execute(text("SELECT COUNT(*) FROM wachet_changes")).scalar()
-    return CountResponse(count=result or 0)
+@app.post("/columns-cache/clear")
+async def clear_columns_cache():
+    """
+    Ops: vacía la cache de columnas de wachet_changes tras aplicar una migración
+    sin reiniciar la API. Inofensivo: la siguiente petición vuelve a leer el esquema.
+    """
+    _columns_cache.clear()
+    return {"ok": True}
+
+
+_count_cache: dict[str, tuple[int, float]] = {}
+_COUNT_CACHE_TTL_SECONDS = 60  # dashboards poll frequently; a slightly stale total is fine
+
+# /summary ya serializado: (body, etag, timestamp). Los refrescos del dashboard que
+# llegan dentro del TTL no vuelven a agrupar; un PATCH de status lo invalida
+_summary_cache: dict[str, tuple[bytes, str, float]] = {}
+_SUMMARY_CACHE_TTL_SECONDS = 5
 
 
-def normalize_raw_notification(value: Any) -> Any:
+def json_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def cached_json_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
     """
-    Return a JSON-friendly raw_notification regardless of whether it comes
-    from JSONB (dict/list) or as a JSON string.
+    JSON body with its ETag, or 304 without body if the client already has it.
+    no-cache: the browser revalidates on every poll (a 304 is a few bytes), so a
+    status change shows up right away instead of after a max-age.
     """
-    if value is None:
-        return None
-    if isinstance(value, (dict, list)):
-        return value
-    if isinstance(value, (bytes, bytearray, memoryview)):
-        try:
-            value = value.decode()
-        except Exception:
-            return None
-    if isinstance(value, str):
-        try:
-            return json.loads(value)
-        except json.JSONDecodeError:
-            return value
-    return value
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-def extract_before_after_from_raw(raw_notification: Any) -> tuple[str | None, str | None]:
+async def get_summary_rows(db: AsyncSession) -> list[Mapping[str, Any]]:
     """
-    Try to extract before/after text from raw_notification using common field names.
-    Returns (before_text, after_text) tuple.
+    Totals per (status, importance).
+    Reads the trigger-maintained wachet_changes_counters table (migration 007);
+    falls back to GROUP BY over wachet_changes if the migration is not applied.
     """
-    if not isinstance(raw_notification, dict):
-        return None, None
+    try:
+        result = await db.execute(_SUMMARY_COUNTERS_STMT)
+        return result.mappings().all()
+    except SQLAlchemyError:
+        logger.debug("wachet_changes_counters no disponible (migración 007), usando GROUP BY")
+        await db.rollback()
 
-    # Common field names for before/after content (Wachete uses comparand/current)
-    before_keys = ("comparand", "before", "previous", "old", "content_before", "previous_text")
-    after_keys = ("current", "after", "new", "content_after", "current_text")
+    result = await db.execute(_SUMMARY_GROUP_BY_STMT)
+    return result.mappings().all()
 
-    before_text = None
-    after_text = None
 
-    for key in before_keys:
-        val = raw_notification.get(key)
-        if val and isinstance(val, str) and val.strip():
-            before_text = val.strip()
-            break
+async def estimate_wachet_changes_count(db: AsyncSession) -> int:
+    """
+    Total without the counters table. On Postgres uses the planner estimate
+    (pg_class.reltuples, refreshed by VACUUM/ANALYZE) instead of a full COUNT(*);
+    other dialects, or a table never analyzed, fall back to COUNT(*).
+    """
+    if db.bind and db.bind.dialect.name == "postgresql":
+        estimate = (
+            await db.execute(_COUNT_ESTIMATE_STMT)
+        ).scalar()
+        # -1 (PG14+) o 0: sin estadísticas todavía
+        if estimate and estimate > 0:
+            return estimate
 
-    for key in after_keys:
-        val = raw_notification.get(key)
-        if val and isinstance(val, str) and val.strip():
-            after_text = val.strip()
-            break
-
-    return before_text, after_text
-
-
-def compute_diff(prev: str, curr: str) -> str | None:
-    """Compute unified diff between previous and current text."""
-    diff = "\n".join(
-        difflib.unified_diff(
-            prev.splitlines(),
-            curr.splitlines(),
-            fromfile="previous",
-            tofile="current",
-            lineterm="",
-        )
-    )
-    return diff if diff.strip() else None
+    return (await db.execute(_COUNT_EXACT_STMT)).scalar_one()
 
 
-def persist_computed_fields(
-    db: Session,
-    change_id: int,
-    previous_text: str | None,
-    current_text: str | None,
-    diff_text: str | None,
-    existing_columns: set[str],
-) -> None:
+@app.get("/wachet-changes/count", response_model=CountResponse)
+async def count_wachet_changes(
+    exact: bool = False,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Persist computed previous_text, current_text, diff_text back to DB.
-    Only updates fields if they are empty in DB and column exists.
+    Total de cambios para el dashboard: tabla de contadores (007) o estimación del
+    planner, cacheado 60 s. exact=true hace COUNT(*) sin cache (recorre la tabla).
     """
-    if "diff_text" not in existing_columns:
-        return  # Migration not applied yet
+    if exact:
+        result = (await db.execute(_COUNT_EXACT_STMT)).scalar_one()
+        return CountResponse(count=result)
 
-    updates: list[str] = []
-    params: dict[str, Any] = {"id": change_id}
+    cached = _count_cache.get("count")
+    if cached and time.time() - cached[1] < _COUNT_CACHE_TTL_SECONDS:
+        body = dump_json({"count": cached[0]})
+        return cached_json_response(body, json_etag(body), if_none_match)
 
-    if previous_text and "previous_text" in existing_columns:
-        updates.append("previous_text = COALESCE(NULLIF(previous_text, ''), :previous_text)")
-        params["previous_text"] = previous_text
+    try:
+        result = (
+            await db.execute(_COUNT_COUNTERS_STMT)
+        ).scalar_one()
+    except SQLAlchemyError:
+        logger.debug("wachet_changes_counters no disponible (migración 007), estimando el total")
+        await db.rollback()
+        result = await estimate_wachet_changes_count(db)
 
-    if current_text and "current_text" in existing_columns:
-        updates.append("current_text = COALESCE(NULLIF(current_text, ''), :current_text)")
-        params["current_text"] = current_text
+    _count_cache["count"] = (int(result), time.time())
+    body = dump_json({"count": int(result)})
+    return cached_json_response(body, json_etag(body), if_none_match)
 
-    if diff_text and "diff_text" in existing_columns:
-        updates.append("diff_text = COALESCE(NULLIF(diff_text, ''), :diff_text)")
-        params["diff_text"] = diff_text
 
-    if not updates:
-        return
+# Common field names for before/after content (Wachete uses comparand/current), by priority
+RAW_BEFORE_KEYS = ("comparand", "before", "previous", "old", "content_before", "previous_text")
+RAW_AFTER_KEYS = ("current", "after", "new", "content_after", "current_text")
+
+
+def _first_raw_text(raw_notification: dict, keys: tuple[str, ...]) -> str | None:
+    """First non-blank string among keys, stripped (a single strip per value)."""
+    for key in keys:
+        val = raw_notification.get(key)
+        if isinstance(val, str):
+            val = val.strip()
+            if val:
+                return val
+    return None
+
+
+def extract_before_after_from_raw(raw_notification: Any) -> tuple[str | None, str | None]:
+    """
+    Try to extract before/after text from raw_notification using common field names.
+    Returns (before_text, after_text) tuple.
+    """
+    # Vacío o no-dict (la mayoría de filas sin Wachete): nada que buscar
+    if not raw_notification or not isinstance(raw_notification, dict):
+        return None, None
 
-    query = f"UPDATE wachet_changes SET {', '.join(updates)} WHERE id = :id"
+    return (
+        _first_raw_text(raw_notification, RAW_BEFORE_KEYS),
+        _first_raw_text(raw_notification, RAW_AFTER_KEYS),
+    )
+
+
+async def persist_computed_fields(
+    db: AsyncSession,
+    rows: list[tuple[int, str | None, str | None, str | None]],
+    existing_columns: frozenset[str],
+) -> bool:
+    """
+    Persist computed previous_text, current_text, diff_text back to DB for many rows
+    in a single UPDATE ... FROM (one round-trip). rows are (id, prev, curr, diff).
+    Only updates fields if they are empty in DB and column exists.
+    Returns False if the UPDATE failed (the caller decides whether that matters).
+    """
+    if "diff_text" not in existing_columns or not rows:
+        return True  # Nothing to write, or migration not applied yet
+
+    fields = [
+        (name, alias)
+        for name, alias in (("previous_text", "p"), ("current_text", "c"), ("diff_text", "d"))
+        if name in existing_columns
+    ]
+
+    # CAST en cada valor: sin tipos, Postgres infiere text en el UNION y w.id = v.id falla
+    params: dict[str, Any] = {}
+    selects: list[str] = []
+    for i, (change_id, previous_text, current_text, diff_text) in enumerate(rows):
+        params[f"r{i}_id"] = change_id
+        params[f"r{i}_p"] = previous_text or None
+        params[f"r{i}_c"] = current_text or None
+        params[f"r{i}_d"] = diff_text or None
+        columns = [f"CAST(:r{i}_id AS INTEGER) AS id"] + [
+            f"CAST(:r{i}_{alias} AS TEXT) AS {alias}" for _, alias in fields
+        ]
+        selects.append(f"SELECT {', '.join(columns)}")
+
+    # Un valor vacío en v deja la columna como está
+    updates = ", ".join(
+        f"{name} = COALESCE(NULLIF(w.{name}, ''), v.{alias}, w.{name})" for name, alias in fields
+    )
+    # UNION ALL en lugar de VALUES ... AS v(id, ...): SQLite no admite alias de columnas en VALUES
+    query = f"""
+        UPDATE wachet_changes AS w
+        SET {updates}
+        FROM ({' UNION ALL '.join(selects)}) AS v
+        WHERE w.id = v.id
+    """
     try:
-        db.execute(text(query), params)
+        await db.execute(text(query), params)
         # Don't commit here - let caller handle transaction
     except Exception:
-        logger.debug("Failed to persist computed fields for id=%s", change_id)
+        logger.debug("Failed to persist computed fields for %d rows", len(rows))
+        return False
+    return True
 
 
-def process_change_item(
-    row: dict,
-    db: Session | None = None,
-    existing_columns: set[str] | None = None,
-    persist: bool = False,
-) -> dict:
+def prepare_change_item(row: Mapping[str, Any]) -> tuple[dict, dict[str, str | None]]:
     """
-    Process a single change row:
-    - Normalize raw_notification
+    Per-row preparation of a change before diffing (cheap, no DB access):
+    - Decode raw_notification when it arrives as JSON text (SQLite)
     - Derive previous_text/current_text from raw_notification if missing
-    - Compute diff_text if missing
-    - Optionally persist computed fields back to DB
+
+    The diff itself is computed in batch by build_change_items (run_diffs).
+    Returns (item, computed) with computed always holding the three keys.
     """
+    # Única copia por fila: este dict es el propio item de la respuesta
     item = dict(row)
-    raw_notif = normalize_raw_notification(item.get("raw_notification"))
-    item["raw_notification"] = raw_notif
+    raw_notif = item.get("raw_notification")
+    # En Postgres asyncpg ya decodifica el JSONB (json_deserializer del engine);
+    # SQLite lo devuelve como texto, otros drivers como bytes (orjson acepta ambos)
+    if isinstance(raw_notif, (str, bytes, bytearray, memoryview)):
+        try:
+            raw_notif = orjson.loads(raw_notif)
+        except orjson.JSONDecodeError:
+            pass
+        item["raw_notification"] = raw_notif
 
     # Get or derive previous/current text
     prev = item.get("previous_text") or ""
@@ -363,93 +565,260 @@ def process_change_item(
         if not prev.strip() and derived_before:
             item["previous_text"] = derived_before
             derived_prev = derived_before
-            prev = derived_before
         if not curr.strip() and derived_after:
             item["current_text"] = derived_after
             derived_curr = derived_after
-            curr = derived_after
-
-    # Compute diff if not present
-    computed_diff = None
-    if not item.get("diff_text"):
-        computed_diff = compute_diff(prev, curr)
-        item["diff_text"] = computed_diff
-
-    # Persist if enabled and we computed new values
-    if persist and db is not None and existing_columns is not None:
-        if derived_prev or derived_curr or computed_diff:
-            persist_computed_fields(
-                db=db,
-                change_id=item["id"],
-                previous_text=derived_prev,
-                current_text=derived_curr,
-                diff_text=computed_diff,
-                existing_columns=existing_columns,
+
+    computed: dict[str, str | None] = {
+        "previous_text": derived_prev,
+        "current_text": derived_curr,
+        "diff_text": None,
+    }
+    return item, computed
+
+
+_diff_pool: ProcessPoolExecutor | None = None
+
+
+def get_diff_pool() -> ProcessPoolExecutor:
+    """Process pool for compute_diff, created on first use (not at import / in tests)."""
+    global _diff_pool
+    if _diff_pool is None:
+        _diff_pool = ProcessPoolExecutor(max_workers=DIFF_POOL_WORKERS)
+    return _diff_pool
+
+
+async def run_diffs(
+    pairs: list[tuple[str, str]], timeout: float = DIFF_TIMEOUT_SECONDS
+) -> list[str | None]:
+    """compute_diffs inline for small batches, in the process pool otherwise."""
+    if sum(len(prev) + len(curr) for prev, curr in pairs) < DIFF_POOL_MIN_CHARS:
+        # Pocos caracteres: enviar a otro proceso cuesta más que el diff
+        return compute_diffs(pairs, timeout)
+    # compute_diff es CPU puro: en procesos aparte no bloquea el event loop ni
+    # compite por el GIL; solo viajan los textos, no las filas completas
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_diff_pool(), compute_diffs, pairs, timeout)
+
+
+# LRU: move_to_end en cada acierto, se expulsa por el principio
+_diff_cache: "OrderedDict[tuple[bytes, bytes], str | None]" = OrderedDict()
+_diff_cache_chars = 0
+
+
+def _text_digest(value: str) -> bytes:
+    return hashlib.blake2b(value.encode(), digest_size=16).digest()
+
+
+def cached_diff(key: tuple[bytes, bytes]) -> tuple[bool, str | None]:
+    """(hit, diff): un diff None también se cachea, así que el acierto va aparte."""
+    if key not in _diff_cache:
+        return False, None
+    _diff_cache.move_to_end(key)
+    return True, _diff_cache[key]
+
+
+def remember_diff(key: tuple[bytes, bytes], diff: str | None) -> None:
+    global _diff_cache_chars
+    size = len(diff or "")
+    if size > DIFF_CACHE_MAX_DIFF_CHARS:
+        return
+    if key in _diff_cache:
+        _diff_cache_chars -= len(_diff_cache.pop(key) or "")
+    _diff_cache[key] = diff
+    _diff_cache_chars += size
+    while _diff_cache_chars > DIFF_CACHE_MAX_CHARS:
+        # El usado hace más tiempo fuera
+        _, evicted = _diff_cache.popitem(last=False)
+        _diff_cache_chars -= len(evicted or "")
+
+
+def clear_diff_cache() -> None:
+    global _diff_cache_chars
+    _diff_cache.clear()
+    _diff_cache_chars = 0
+
+
+async def build_change_items(
+    rows: list[Mapping[str, Any]],
+) -> tuple[list[dict], list[tuple[int, str | None, str | None, str | None]]]:
+    """
+    Process rows into response items. Returns (items, pending) where pending holds
+    (id, prev, curr, diff) for the rows whose derived fields should be backfilled.
+    Diffs computed here use LIST_DIFF_TIMEOUT_SECONDS and are only shown, never
+    persisted (pending carries diff None): POST /wachet-changes/backfill-diffs stores
+    them at the full DIFF_TIMEOUT_SECONDS.
+    """
+    processed = [prepare_change_item(r) for r in rows]
+
+    missing: list[tuple[dict, tuple[bytes, bytes]]] = []
+    pairs: list[tuple[str, str]] = []
+    for item, computed in processed:
+        if item.get("diff_text"):
+            continue
+        prev, curr = item.get("previous_text") or "", item.get("current_text") or ""
+        # Textos enormes: sin diff en el listado (filter-worker lo guarda al procesar
+        # la fila y el detalle del dashboard lo calcula si falta)
+        if len(prev) + len(curr) > LIST_DIFF_MAX_CHARS:
+            continue
+        key = (_text_digest(prev), _text_digest(curr))
+        hit, diff = cached_diff(key)
+        if hit:
+            item["diff_text"] = diff
+            continue
+        missing.append((item, key))
+        pairs.append((prev, curr))
+
+    if missing:
+        diffs = await run_diffs(pairs, LIST_DIFF_TIMEOUT_SECONDS)
+        # Solo para la respuesta: con el timeout corto el diff puede ser menos mínimo y
+        # no se guarda (computed["diff_text"] queda en None)
+        for (item, key), diff in zip(missing, diffs):
+            item["diff_text"] = diff
+            remember_diff(key, diff)
+
+    items: list[dict] = []
+    pending: list[tuple[int, str | None, str | None, str | None]] = []
+    for item, computed in processed:
+        items.append(item)
+        if any(computed.values()):
+            pending.append(
+                (
+                    item["id"],
+                    computed["previous_text"],
+                    computed["current_text"],
+                    computed["diff_text"],
+                )
             )
+    return items, pending
 
-    return item
 
+@lru_cache(maxsize=64)
+def _list_statement(query: str, yield_per: int) -> TextClause:
+    """
+    TextClause reutilizable por cada variante del SQL de los listados (columnas x
+    filtros): text() no vuelve a parsear los bind params en cada petición y la
+    sentencia compilada sale de la cache de SQLAlchemy. asyncpg además mantiene
+    los prepared statements por conexión, así que Postgres no vuelve a planificar.
+    """
+    return text(query).execution_options(yield_per=yield_per)
 
-@app.get("/wachet-changes", response_model=WachetChangesResponse)
-def list_changes(
-    status: Optional[str] = None,
-    importance: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
+
+async def open_change_stream(
+    db: AsyncSession,
+    query: str,
+    params: dict[str, object],
+) -> AsyncResult:
     """
-    Lista TODOS los cambios de wachet_changes con filtros opcionales:
-    - status (NEW, PENDING, FILTERED, VALIDATED, PUBLISHED, etc.)
-    - importance (IMPORTANT, NOT_IMPORTANT)
-    - search (busca en título, razón IA y URL)
-    
-    Si no se pasan filtros, devuelve TODOS los registros (cualquier status).
+    Run a list query with a server-side cursor. Executing it here, before the
+    response starts, keeps SQL errors (missing migrations) as a normal 500.
     """
-    existing_columns = get_existing_columns(db)
-
-    base_columns = [
-        "id",
-        "wachet_id",
-        "wachete_notification_id",
-        "url",
-        "title",
-        "importance",
-        "ai_score",
-        "ai_reason",
-        "status",
-        "raw_content",
-        "raw_notification",
-        "created_at",
-        "updated_at",
-    ]
+    return await db.stream(_list_statement(query, LIST_STREAM_CHUNK_ROWS), params)
 
-    missing_columns: list[str] = []
-    select_columns = base_columns.copy()
 
-    # Handle optional columns (headline, source_name, source_country)
-    for col in OPTIONAL_CHANGE_COLUMNS:
-        if col in existing_columns:
-            select_columns.append(col)
-        else:
-            select_columns.append(f"NULL AS {col}")
-            missing_columns.append(col)
+async def stream_change_items(
+    result: AsyncResult,
+    pending: list[tuple[int, str | None, str | None, str | None]],
+    include_raw: bool = True,
+    page_limit: int | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    JSON body of a list response, one chunk of LIST_STREAM_CHUNK_ROWS rows at a time:
+    only one chunk of raw rows (raw_notification, textos, diff) and its serialized
+    items are held in memory. Rows to backfill are appended to pending as they are
+    processed. With page_limit, next_cursor / next_cursor_id are added when the page
+    is full.
+    """
+    yield b'{"items":['
+    total = 0
+    last_item: dict | None = None
+    async for rows in result.mappings().partitions():
+        chunk_items, chunk_pending = await build_change_items(rows)
+        pending.extend(chunk_pending)
+        if not include_raw:
+            # Solo se leyó para derivar previous/current text, no se devuelve
+            for item in chunk_items:
+                item["raw_notification"] = None
+        chunk = b",".join(dump_json(item) for item in chunk_items)
+        yield chunk if not total else b"," + chunk
+        total += len(chunk_items)
+        last_item = chunk_items[-1]
+
+    tail: dict[str, object] = {"total": total}
+    if page_limit is not None:
+        full_page = last_item is not None and total == page_limit
+        tail["next_cursor"] = last_item["created_at"] if full_page else None
+        tail["next_cursor_id"] = last_item["id"] if full_page else None
+    # '],' + el objeto final sin su '{' inicial
+    yield b"]," + dump_json(tail)[1:]
+
+
+async def backfill_computed_fields(
+    pending: list[tuple[int, str | None, str | None, str | None]],
+    existing_columns: frozenset[str],
+) -> None:
+    """
+    Save-on-read fuera del GET: se ejecuta como BackgroundTask, después de enviar la
+    respuesta, con su propia sesión (la de la petición ya está cerrada). Best-effort.
+    """
+    if not pending:
+        return
+    async with SessionLocal() as db:
+        try:
+            await persist_computed_fields(db, pending, existing_columns)
+            await db.commit()
+        except Exception:
+            logger.debug("Failed to backfill computed fields for %d rows", len(pending))
+            await db.rollback()
+
+
+LIST_BASE_COLUMNS = (
+    "id",
+    "wachet_id",
+    "wachete_notification_id",
+    "url",
+    "title",
+    "importance",
+    "ai_score",
+    "ai_reason",
+    "status",
+    "created_at",
+    "updated_at",
+)
 
-    # Handle diff columns (previous_text, current_text, diff_text)
-    for col in OPTIONAL_DIFF_COLUMNS:
-        if col in existing_columns:
-            select_columns.append(col)
+
+@lru_cache(maxsize=8)
+def _build_select_columns(existing_columns: frozenset[str], include_raw: bool = True) -> str:
+    """
+    SELECT list of a change row for the columns present in this schema, with
+    NULL AS <col> for optional columns whose migration is missing.
+    Without include_raw, raw_content is not read and raw_notification only for the
+    rows that still need it to derive previous/current text.
+    """
+    missing_columns: list[str] = []
+    select_columns = list(LIST_BASE_COLUMNS)
+
+    if include_raw:
+        select_columns += ["raw_content", "raw_notification"]
+    else:
+        select_columns.append("NULL AS raw_content")
+        if {"previous_text", "current_text"} <= existing_columns:
+            select_columns.append(
+                "CASE WHEN COALESCE(previous_text, '') = '' OR COALESCE(current_text, '') = '' "
+                "THEN raw_notification END AS raw_notification"
+            )
         else:
-            select_columns.append(f"NULL AS {col}")
-            missing_columns.append(col)
+            select_columns.append("raw_notification")
 
-    # Handle WatchGuard columns (source, content_hash, fetch_mode, snapshot_ref, fetched_at)
-    for col in OPTIONAL_WATCHGUARD_COLUMNS:
+    # Optional columns: headline/source_*, previous/current/diff_text, WatchGuard fields
+    for col in OPTIONAL_CHANGE_COLUMNS + OPTIONAL_DIFF_COLUMNS + OPTIONAL_WATCHGUARD_COLUMNS:
         if col in existing_columns:
             select_columns.append(col)
         else:
             select_columns.append(f"NULL AS {col}")
             missing_columns.append(col)
 
+    # Se avisa una vez por variante, no en cada petición
     if missing_columns:
         logger.warning(
             "Faltan columnas en wachet_changes: %s (rellenando con NULL). "
@@ -457,30 +826,116 @@ def list_changes(
             ", ".join(sorted(missing_columns)),
         )
 
-    query = """
-        SELECT {columns}
+    return ",\n               ".join(select_columns)
+
+
+@lru_cache(maxsize=64)
+def _build_list_query(
+    existing_columns: frozenset[str],
+    has_status: bool = False,
+    has_importance: bool = False,
+    has_search: bool = False,
+    has_cursor: bool = False,
+    has_cursor_id: bool = False,
+    include_raw: bool = True,
+    search_fts: bool = False,
+    filtered_only: bool = False,
+) -> str:
+    """
+    Full SQL of GET /wachet-changes (and /filtered, with filtered_only) for this
+    schema and the filters in use. Cached per (column set, filters): requests only
+    build the params, and each variant is always the same SQL text.
+    """
+    conditions: list[str] = []
+    if filtered_only:
+        conditions.append("status IN ('FILTERED', 'PENDING')")
+    if has_status:
+        conditions.append("status = :status")
+    if has_importance:
+        conditions.append("importance = :importance")
+    if has_search and search_fts and "search_tsv" in existing_columns:
+        # Columna generada + GIN de la migración 010 (por palabras, con stemming en español).
+        # websearch_to_tsquery nunca falla con la entrada del usuario, a diferencia de to_tsquery
+        conditions.append("search_tsv @@ websearch_to_tsquery('spanish', :search)")
+    elif has_search:
+        conditions.append("(title ILIKE :q OR ai_reason ILIKE :q OR url ILIKE :q)")
+    if has_cursor:
+        # id desempata filas con el mismo created_at (p. ej. insertadas en el mismo segundo).
+        # Comparación de filas: Postgres la resuelve como un único rango sobre
+        # idx_wachet_changes_created_id, el OR equivalente no
+        if has_cursor_id:
+            conditions.append("(created_at, id) < (:cursor, :cursor_id)")
+        else:
+            conditions.append("created_at < :cursor")
+
+    # status / importance por igualdad + este ORDER BY: cubiertos por los índices
+    # (status[, importance], created_at DESC, id DESC) de las migraciones 009 y 012
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"""
+        SELECT {_build_select_columns(existing_columns, include_raw)}
         FROM wachet_changes
-        WHERE 1 = 1
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT :limit OFFSET :offset
     """
-    query = query.format(columns=",\n               ".join(select_columns))
-    params: dict[str, object] = {}
 
+
+@app.get("/wachet-changes", response_model=WachetChangesResponse)
+async def list_changes(
+    background_tasks: BackgroundTasks,
+    status: Optional[StatusFilter] = None,
+    importance: Optional[ImportanceFilter] = None,
+    search: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[datetime] = None,
+    cursor_id: Optional[int] = None,
+    include_raw: bool = True,
+    mode: Literal["substring", "fts"] = "substring",
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Lista TODOS los cambios de wachet_changes con filtros opcionales:
+    - status (NEW, PENDING, FILTERED, VALIDATED, PUBLISHED, etc.)
+    - importance (IMPORTANT, NOT_IMPORTANT)
+    - search (busca en título, razón IA y URL)
+    - mode=fts: search por palabras sobre título y razón IA (full-text, migración 010),
+      con sintaxis de buscador: "frase exacta", or, -excluir. Sin la migración se usa
+      la búsqueda por subcadena
+    - limit / offset (paginación, máximo 500 por página)
+    - cursor / cursor_id (paginación keyset: los next_cursor / next_cursor_id de la
+      página anterior; a diferencia de offset, no recorre las filas ya vistas)
+    - include_raw=false: sin raw_content / raw_notification (pueden ser varios KB por
+      fila); el detalle completo está en GET /wachet-changes/{id}
+    
+    Si no se pasan filtros, devuelve TODOS los registros (cualquier status).
+    """
+    existing_columns = await get_existing_columns(db)
+    query = _build_list_query(
+        existing_columns,
+        has_status=bool(status),
+        has_importance=bool(importance),
+        has_search=bool(search),
+        has_cursor=cursor is not None,
+        has_cursor_id=cursor is not None and cursor_id is not None,
+        include_raw=include_raw,
+        search_fts=mode == "fts",
+    )
+    params: dict[str, object] = {"limit": limit, "offset": offset}
     if status:
-        query += " AND status = :status"
         params["status"] = status
-
     if importance:
-        query += " AND importance = :importance"
         params["importance"] = importance
-
     if search:
-        query += " AND (title ILIKE :q OR ai_reason ILIKE :q OR url ILIKE :q)"
         params["q"] = f"%{search}%"
-
-    query += " ORDER BY created_at DESC LIMIT 500"
+        params["search"] = search
+    if cursor is not None:
+        params["cursor"] = cursor
+        if cursor_id is not None:
+            params["cursor_id"] = cursor_id
 
     try:
-        rows = db.execute(text(query), params).mappings().all()
+        result = await open_change_stream(db, query, params)
     except SQLAlchemyError as exc:
         logger.exception("Error al consultar wachet_changes")
         raise HTTPException(
@@ -488,109 +943,99 @@ def list_changes(
             detail="No se pudo consultar wachet_changes (revisa las migraciones de la tabla).",
         ) from exc
 
-    items = [
-        process_change_item(
-            row=dict(r),
-            db=db,
-            existing_columns=existing_columns,
-            persist=True,  # Enable save-on-read for computed fields
-        )
-        for r in rows
-    ]
-
-    # Best-effort commit for any persisted fields
-    try:
-        db.commit()
-    except Exception:
-        pass
+    # Save-on-read después de responder (las background tasks corren cuando termina el
+    # stream, con pending ya completo): el GET queda en SELECT + CPU
+    pending: list[tuple[int, str | None, str | None, str | None]] = []
+    background_tasks.add_task(backfill_computed_fields, pending, existing_columns)
 
-    return WachetChangesResponse(items=items, total=len(items))
+    # Items are already plain dicts with the WachetChangeItem shape: stream them
+    # serialized chunk by chunk instead of building one pydantic model per row
+    return StreamingResponse(
+        stream_change_items(result, pending, include_raw=include_raw, page_limit=limit),
+        media_type="application/json",
+    )
 
 
 @app.get("/wachet-changes/filtered", response_model=WachetChangesResponse)
-def list_filtered_changes(
-    importance: Optional[str] = None,
+async def list_filtered_changes(
+    background_tasks: BackgroundTasks,
+    importance: Optional[ImportanceFilter] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Lista cambios con status = 'FILTERED' o 'PENDING' (legacy endpoint).
     Puedes usar /wachet-changes?status=FILTERED en su lugar.
     """
-    existing_columns = get_existing_columns(db)
-
-    query = """
-        SELECT id,
-               wachet_id,
-               wachete_notification_id,
-               url,
-               title,
-               importance,
-               ai_score,
-               ai_reason,
-               status,
-               raw_notification,
-               previous_text,
-               current_text,
-               diff_text,
-               created_at,
-               updated_at
-        FROM wachet_changes
-        WHERE status IN ('FILTERED', 'PENDING')
-    """
-
-    params: dict[str, object] = {}
-
+    existing_columns = await get_existing_columns(db)
+    query = _build_list_query(
+        existing_columns,
+        has_importance=bool(importance),
+        has_search=bool(search),
+        filtered_only=True,
+    )
+    params: dict[str, object] = {"limit": limit, "offset": offset}
     if importance:
-        query += " AND importance = :importance"
         params["importance"] = importance
-
     if search:
-        query += " AND (title ILIKE :q OR ai_reason ILIKE :q OR url ILIKE :q)"
         params["q"] = f"%{search}%"
 
-    query += " ORDER BY created_at DESC LIMIT 100"
-
-    rows = db.execute(text(query), params).mappings().all()
-    items = [
-        process_change_item(
-            row=dict(r),
-            db=db,
-            existing_columns=existing_columns,
-            persist=True,
-        )
-        for r in rows
-    ]
+    result = await open_change_stream(db, query, params)
+    pending: list[tuple[int, str | None, str | None, str | None]] = []
+    background_tasks.add_task(backfill_computed_fields, pending, existing_columns)
 
-    # Best-effort commit for any persisted fields
-    try:
-        db.commit()
-    except Exception:
-        pass
-
-    return WachetChangesResponse(items=items, total=len(items))
+    return StreamingResponse(stream_change_items(result, pending), media_type="application/json")
 
 
 @app.get("/wachet-changes/summary", response_model=SummaryResponse)
-def summary_changes(db: Session = Depends(get_db)):
+async def summary_changes(
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Resumen por status + importancia (para las cards del dashboard).
     Agrupa NEW, PENDING/FILTERED, VALIDATED/PUBLISHED.
+    Incluye el total general, así el dashboard no necesita llamar a /count.
+    Con ETag: si no cambió desde el último poll responde 304 sin body.
     """
-    rows = db.execute(
-        text(
-            """
-            SELECT
-              status,
-              importance,
-              COUNT(*) AS total
-            FROM wachet_changes
-            GROUP BY status, importance
-            ORDER BY status, importance
-            """
-        )
-    ).mappings().all()
-    return SummaryResponse(items=[SummaryItem(**dict(r)) for r in rows])
+    cached = _summary_cache.get("summary")
+    if cached and time.time() - cached[2] < _SUMMARY_CACHE_TTL_SECONDS:
+        return cached_json_response(cached[0], cached[1], if_none_match)
+
+    items = [dict(r) for r in await get_summary_rows(db)]
+    # Como los listados: dicts directos a orjson, sin jsonable_encoder ni un modelo por fila
+    body = dump_json({"items": items, "total": sum(item["total"] for item in items)})
+    etag = json_etag(body)
+    _summary_cache["summary"] = (body, etag, time.time())
+    return cached_json_response(body, etag, if_none_match)
+
+
+@app.get("/wachet-changes/{change_id}", response_model=WachetChangeItem)
+async def get_change(
+    change_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Un cambio completo, con raw_content / raw_notification (para listados con
+    include_raw=false).
+    """
+    existing_columns = await get_existing_columns(db)
+    query = f"""
+        SELECT {_build_select_columns(existing_columns)}
+        FROM wachet_changes
+        WHERE id = :id
+    """
+    rows = (await db.execute(text(query), {"id": change_id})).mappings().all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Change not found")
+
+    items, pending = await build_change_items(rows)
+    if pending:
+        background_tasks.add_task(backfill_computed_fields, pending, existing_columns)
+    return ORJSONResponse(items[0])
 
 
 # --------- Actualización de estado ---------
@@ -600,11 +1045,69 @@ class ChangeUpdate(BaseModel):
     status: Optional[str] = None
 
 
+@app.post("/wachet-changes/backfill-diffs")
+async def backfill_diffs(
+    after_id: int = Query(0, ge=0),
+    # Como el listado: una página se diffea en una sola tarea del pool (1 s por fila
+    # como máximo) y se guarda con un UPDATE de un SELECT por fila
+    limit: int = Query(500, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Guarda diff_text (y previous/current text derivados de raw_notification) en filas
+    antiguas que no lo tienen, para que los listados no tengan que calcularlo.
+    Los escritores actuales (ingestor, /ingest/changes, filter-worker) ya lo guardan.
+    Llamar repetidamente con after_id = next_after_id hasta que sea null.
+    """
+    existing_columns = await get_existing_columns(db)
+    if not {"previous_text", "current_text", "diff_text"} <= existing_columns:
+        raise HTTPException(status_code=400, detail="Falta la migración 002 (columnas de diff)")
+
+    rows = (
+        await db.execute(
+            text(
+                """
+                SELECT id, raw_notification, previous_text, current_text, diff_text
+                FROM wachet_changes
+                WHERE id > :after_id AND COALESCE(diff_text, '') = ''
+                ORDER BY id
+                LIMIT :limit
+                """
+            ),
+            {"after_id": after_id, "limit": limit},
+        )
+    ).mappings().all()
+
+    processed = [prepare_change_item(r) for r in rows]
+    # Sin LIST_DIFF_MAX_CHARS ni el timeout del listado: el diff se guarda una sola vez
+    diffs = await run_diffs(
+        [(item.get("previous_text") or "", item.get("current_text") or "") for item, _ in processed]
+    )
+    pending = [
+        (item["id"], computed["previous_text"], computed["current_text"], diff)
+        for (item, computed), diff in zip(processed, diffs)
+        if diff or computed["previous_text"] or computed["current_text"]
+    ]
+    if not await persist_computed_fields(db, pending, existing_columns):
+        await db.rollback()
+        logger.error(
+            "backfill-diffs: no se pudieron guardar %d filas (after_id=%d)", len(pending), after_id
+        )
+        raise HTTPException(status_code=500, detail="No se pudieron guardar los diffs")
+    await db.commit()
+
+    return {
+        "ok": True,
+        "updated": len(pending),
+        "next_after_id": rows[-1]["id"] if len(rows) == limit else None,
+    }
+
+
 @app.patch("/wachet-changes/{change_id}", response_model=UpdateResponse)
-def update_wachet_change(
+async def update_wachet_change(
     change_id: int,
     payload: ChangeUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Actualiza el status de un cambio.
@@ -620,23 +1123,34 @@ def update_wachet_change(
             detail=f"Status no válido. Usa uno de: {', '.join(sorted(ALLOWED_STATUSES))}"
         )
 
-    result = db.execute(
+    # Una sola sentencia con RETURNING: la fila actualizada sin un SELECT aparte
+    result = await db.execute(
         text(
             """
             UPDATE wachet_changes
             SET status = :status,
                 updated_at = NOW()
             WHERE id = :id
+            RETURNING id, wachet_id, url, title, importance, ai_score, ai_reason,
+                      status, created_at, updated_at
             """
         ),
         {"status": payload.status, "id": change_id},
     )
+    row = result.mappings().first()
+    await db.commit()
 
-    if result.rowcount == 0:
+    if row is None:
         raise HTTPException(status_code=404, detail="Cambio no encontrado")
 
-    db.commit()
-    return UpdateResponse(ok=True, id=change_id, status=payload.status)
+    # El resumen por status cambió: el siguiente poll lo recalcula
+    _summary_cache.clear()
+    return UpdateResponse(
+        ok=True,
+        id=change_id,
+        status=payload.status,
+        item=WachetChangeItem(**row),
+    )
 
 
 # ---------- Change Ingestion System (for WatchGuard and external sources) ----------
@@ -684,20 +1198,51 @@ def verify_ingest_token(x_ingest_token: Optional[str] = Header(default=None)) ->
         )
 
 
+@lru_cache(maxsize=4096)
+def _url_hash(url: str) -> str:
+    # Mismo hash que watchguard.normalizer.generate_wachet_id: los ids de una URL
+    # coinciden vengan de donde vengan. Las URLs monitorizadas se repiten en cada ingesta.
+    return hashlib.sha256(url.encode()).hexdigest()[:12]
+
+
 def generate_wachet_id(source: str, url: str) -> str:
     """
     Generate a unique wachet_id for external sources.
     Format: {source}:{url_hash}:{unix_ts}
     """
-    url_hash = hashlib.sha256(url.encode()).hexdigest()[:12]
-    unix_ts = int(datetime.utcnow().timestamp())
+    url_hash = _url_hash(url)
+    # Sin datetime intermedio (datetime.utcnow() además está deprecado)
+    unix_ts = time.time_ns() // 1_000_000_000
     return f"{source}:{url_hash}:{unix_ts}"
 
 
+# Ingestas recientes de este proceso: (url, content_hash) -> (id, wachet_id, created_ts).
+# Los feeds de WatchGuard reenvían mucho el mismo contenido: un duplicado conocido se
+# responde sin diff ni round-trip a Postgres
+_recent_ingest_cache: dict[tuple[str, str], tuple[Optional[int], str, float]] = {}
+_RECENT_INGEST_TTL_SECONDS = 24 * 60 * 60  # misma ventana que el dedupe del INSERT
+_RECENT_INGEST_MAX_ENTRIES = 100_000
+
+
+def remember_ingest(
+    key: tuple[str, str],
+    change_id: Optional[int],
+    wachet_id: str,
+    created_ts: float,
+) -> None:
+    if len(_recent_ingest_cache) >= _RECENT_INGEST_MAX_ENTRIES:
+        cutoff = time.time() - _RECENT_INGEST_TTL_SECONDS
+        for k in [k for k, v in _recent_ingest_cache.items() if v[2] < cutoff]:
+            del _recent_ingest_cache[k]
+        if len(_recent_ingest_cache) >= _RECENT_INGEST_MAX_ENTRIES:
+            _recent_ingest_cache.clear()
+    _recent_ingest_cache[key] = (change_id, wachet_id, created_ts)
+
+
 @app.post("/ingest/changes", response_model=ChangeIngestResponse)
-def ingest_change(
+async def ingest_change(
     payload: ChangeIngestV1,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _: None = Depends(verify_ingest_token),
 ):
     """
@@ -721,32 +1266,21 @@ def ingest_change(
     wachet_id = payload.wachet_id or generate_wachet_id(payload.source, payload.url)
 
     # Check existing columns to ensure migration has been applied
-    existing_columns = get_existing_columns(db)
+    existing_columns = await get_existing_columns(db)
     if "source" not in existing_columns:
         raise HTTPException(
             status_code=500,
             detail="Migration 004 not applied. Run: psql $DATABASE_URL -f migrations/004_add_watchguard_fields.sql"
         )
 
-    # Dedupe check: look for same url + content_hash in last 24 hours
-    if payload.content_hash and payload.url:
-        dedupe_query = text("""
-            SELECT id, wachet_id FROM wachet_changes
-            WHERE url = :url
-              AND content_hash = :content_hash
-              AND created_at > NOW() - INTERVAL '24 hours'
-            LIMIT 1
-        """)
-        existing = db.execute(
-            dedupe_query,
-            {"url": payload.url, "content_hash": payload.content_hash}
-        ).mappings().first()
-
-        if existing:
+    dedupe_key = (payload.url, payload.content_hash) if payload.content_hash else None
+    if dedupe_key:
+        cached = _recent_ingest_cache.get(dedupe_key)
+        if cached and time.time() - cached[2] < _RECENT_INGEST_TTL_SECONDS:
             return ChangeIngestResponse(
                 ok=True,
-                id=existing["id"],
-                wachet_id=existing["wachet_id"],
+                id=cached[0],
+                wachet_id=cached[1],
                 message="Change already exists (duplicate within 24h window)",
                 duplicate=True,
             )
@@ -754,26 +1288,39 @@ def ingest_change(
     # Compute diff if not provided
     diff_text = payload.diff_text
     if not diff_text and payload.previous_text and payload.current_text:
-        diff_text = compute_diff(payload.previous_text, payload.current_text)
+        loop = asyncio.get_running_loop()
+        diff_text = await loop.run_in_executor(
+            None, compute_diff, payload.previous_text, payload.current_text
+        )
 
-    # Insert new change with status NEW
+    # Insert new change with status NEW, in one statement with the dedupe:
+    # - NOT EXISTS: same url + content_hash in the last 24 hours
+    # - ON CONFLICT DO NOTHING: any unique index (ux_wachet_changes_url_hash_day, ...)
+    # INSERT ... SELECT no infiere tipos de las columnas destino: CAST en los no-texto
     insert_query = text("""
         INSERT INTO wachet_changes (
             wachet_id, url, title, status,
             previous_text, current_text, diff_text,
             source, content_hash, fetch_mode, fetched_at, snapshot_ref,
             raw_notification, created_at, updated_at
-        ) VALUES (
+        )
+        SELECT
             :wachet_id, :url, :title, 'NEW',
             :previous_text, :current_text, :diff_text,
-            :source, :content_hash, :fetch_mode, :fetched_at, :snapshot_ref,
-            :raw_notification, NOW(), NOW()
+            :source, :content_hash, :fetch_mode, CAST(:fetched_at AS TIMESTAMPTZ), :snapshot_ref,
+            CAST(:raw_notification AS JSONB), NOW(), NOW()
+        WHERE NOT EXISTS (
+            SELECT 1 FROM wachet_changes
+            WHERE url = :url
+              AND content_hash = :content_hash
+              AND created_at > NOW() - INTERVAL '24 hours'
         )
+        ON CONFLICT DO NOTHING
         RETURNING id
     """)
 
     try:
-        result = db.execute(
+        result = await db.execute(
             insert_query,
             {
                 "wachet_id": wachet_id,
@@ -787,12 +1334,23 @@ def ingest_change(
                 "fetch_mode": payload.fetch_mode,
                 "fetched_at": payload.fetched_at,
                 "snapshot_ref": payload.snapshot_ref,
-                "raw_notification": json.dumps(payload.raw_notification) if payload.raw_notification else None,
+                "raw_notification": orjson.dumps(payload.raw_notification).decode() if payload.raw_notification else None,
             }
         )
         new_id = result.scalar()
-        db.commit()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        logger.exception("Integrity error during change ingestion")
+        raise HTTPException(status_code=500, detail="Database integrity error during ingestion")
+    except Exception as e:
+        await db.rollback()
+        logger.exception("Error ingesting change")
+        raise HTTPException(status_code=500, detail=f"Error ingesting change: {str(e)}")
 
+    if new_id is not None:
+        if dedupe_key:
+            remember_ingest(dedupe_key, new_id, wachet_id, time.time())
         return ChangeIngestResponse(
             ok=True,
             id=new_id,
@@ -800,23 +1358,33 @@ def ingest_change(
             message="Change ingested successfully",
             duplicate=False,
         )
-    except IntegrityError as e:
-        db.rollback()
-        # Likely hit the unique constraint - treat as duplicate
-        if "ux_wachet_changes_url_hash_day" in str(e):
-            return ChangeIngestResponse(
-                ok=True,
-                id=None,
-                wachet_id=wachet_id,
-                message="Change already exists (same URL + hash on same day)",
-                duplicate=True,
-            )
-        logger.exception("Integrity error during change ingestion")
-        raise HTTPException(status_code=500, detail="Database integrity error during ingestion")
-    except Exception as e:
-        db.rollback()
-        logger.exception("Error ingesting change")
-        raise HTTPException(status_code=500, detail=f"Error ingesting change: {str(e)}")
+
+    # Duplicado: solo en este caso se busca la fila existente para devolver su id
+    existing = (
+        await db.execute(
+            text("""
+                SELECT id, wachet_id, created_at FROM wachet_changes
+                WHERE url = :url
+                  AND content_hash = :content_hash
+                ORDER BY created_at DESC
+                LIMIT 1
+            """),
+            {"url": payload.url, "content_hash": payload.content_hash},
+        )
+    ).mappings().first()
+
+    if dedupe_key and existing and isinstance(existing["created_at"], datetime):
+        remember_ingest(
+            dedupe_key, existing["id"], existing["wachet_id"], existing["created_at"].timestamp()
+        )
+
+    return ChangeIngestResponse(
+        ok=True,
+        id=existing["id"] if existing else None,
+        wachet_id=existing["wachet_id"] if existing else wachet_id,
+        message="Change already exists (duplicate within 24h window)",
+        duplicate=True,
+    )
 
 
 # ---------- WatchGuard Scheduler Control ----------
@@ -918,18 +1486,20 @@ def calculate_next_scheduled_run(
             return tomorrow_start
 
 
-def get_scheduler_config(db: Session) -> dict:
+async def get_scheduler_config(db: AsyncSession) -> dict:
     """
     Get scheduler configuration from database.
     Returns default values if table doesn't exist or is empty.
     """
     try:
-        result = db.execute(
-            text("""
-                SELECT enabled, start_hour, end_hour, interval_hours, last_run, trigger_now
-                FROM watchguard_scheduler_config
-                LIMIT 1
-            """)
+        result = (
+            await db.execute(
+                text("""
+                    SELECT enabled, start_hour, end_hour, interval_hours, last_run, trigger_now
+                    FROM watchguard_scheduler_config
+                    LIMIT 1
+                """)
+            )
         ).mappings().first()
 
         if result:
@@ -957,12 +1527,12 @@ def get_scheduler_config(db: Session) -> dict:
 
 
 @app.get("/watchguard/scheduler/status", response_model=SchedulerStatusResponse)
-def get_scheduler_status(db: Session = Depends(get_db)):
+async def get_scheduler_status(db: AsyncSession = Depends(get_db)):
     """
     Get current scheduler status and configuration.
     Includes calculated next_scheduled_run based on config.
     """
-    config = get_scheduler_config(db)
+    config = await get_scheduler_config(db)
 
     next_run = calculate_next_scheduled_run(
         enabled=config["enabled"],
@@ -984,12 +1554,12 @@ def get_scheduler_status(db: Session = Depends(get_db)):
 
 
 @app.post("/watchguard/scheduler/toggle", response_model=SchedulerUpdateResponse)
-def toggle_scheduler(payload: SchedulerToggleRequest, db: Session = Depends(get_db)):
+async def toggle_scheduler(payload: SchedulerToggleRequest, db: AsyncSession = Depends(get_db)):
     """
     Enable or disable the WatchGuard scheduler.
     """
     try:
-        result = db.execute(
+        result = await db.execute(
             text("""
                 UPDATE watchguard_scheduler_config
                 SET enabled = :enabled, updated_at = NOW(), updated_by = 'api'
@@ -1000,7 +1570,7 @@ def toggle_scheduler(payload: SchedulerToggleRequest, db: Session = Depends(get_
 
         if result.rowcount == 0:
             # No config row exists, insert one
-            db.execute(
+            await db.execute(
                 text("""
                     INSERT INTO watchguard_scheduler_config (enabled, updated_by)
                     VALUES (:enabled, 'api')
@@ -1008,18 +1578,18 @@ def toggle_scheduler(payload: SchedulerToggleRequest, db: Session = Depends(get_
                 {"enabled": payload.enabled}
             )
 
-        db.commit()
+        await db.commit()
 
         status = "enabled" if payload.enabled else "disabled"
         return SchedulerUpdateResponse(ok=True, message=f"Scheduler {status}")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.exception("Error toggling scheduler")
         raise HTTPException(status_code=500, detail=f"Error updating scheduler: {str(e)}")
 
 
 @app.post("/watchguard/scheduler/config", response_model=SchedulerUpdateResponse)
-def update_scheduler_config(payload: SchedulerConfigRequest, db: Session = Depends(get_db)):
+async def update_scheduler_config(payload: SchedulerConfigRequest, db: AsyncSession = Depends(get_db)):
     """
     Update scheduler configuration (start_hour, end_hour, interval_hours).
     Only provided fields are updated.
@@ -1043,7 +1613,7 @@ def update_scheduler_config(payload: SchedulerConfigRequest, db: Session = Depen
         raise HTTPException(status_code=400, detail="No configuration fields provided")
 
     # Validate start_hour < end_hour if both are provided or being updated
-    config = get_scheduler_config(db)
+    config = await get_scheduler_config(db)
     new_start = payload.start_hour if payload.start_hour is not None else config["start_hour"]
     new_end = payload.end_hour if payload.end_hour is not None else config["end_hour"]
 
@@ -1054,7 +1624,7 @@ def update_scheduler_config(payload: SchedulerConfigRequest, db: Session = Depen
     updates.append("updated_by = 'api'")
 
     try:
-        result = db.execute(
+        result = await db.execute(
             text(f"""
                 UPDATE watchguard_scheduler_config
                 SET {', '.join(updates)}
@@ -1069,24 +1639,24 @@ def update_scheduler_config(payload: SchedulerConfigRequest, db: Session = Depen
                 detail="No scheduler config found. Run migration 005."
             )
 
-        db.commit()
+        await db.commit()
         return SchedulerUpdateResponse(ok=True, message="Scheduler configuration updated")
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.exception("Error updating scheduler config")
         raise HTTPException(status_code=500, detail=f"Error updating config: {str(e)}")
 
 
 @app.post("/watchguard/scheduler/trigger", response_model=SchedulerTriggerResponse)
-def trigger_scheduler(db: Session = Depends(get_db)):
+async def trigger_scheduler(db: AsyncSession = Depends(get_db)):
     """
     Trigger an immediate scheduler run.
     Sets trigger_now flag that WatchGuard service checks.
     """
     try:
-        result = db.execute(
+        result = await db.execute(
             text("""
                 UPDATE watchguard_scheduler_config
                 SET trigger_now = TRUE, updated_at = NOW(), updated_by = 'api_trigger'
@@ -1100,7 +1670,7 @@ def trigger_scheduler(db: Session = Depends(get_db)):
                 detail="No scheduler config found. Run migration 005."
             )
 
-        db.commit()
+        await db.commit()
         return SchedulerTriggerResponse(
             ok=True,
             message="Immediate run triggered. WatchGuard will process on next check.",
@@ -1109,29 +1679,29 @@ def trigger_scheduler(db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.exception("Error triggering scheduler")
         raise HTTPException(status_code=500, detail=f"Error triggering scheduler: {str(e)}")
 
 
 @app.post("/watchguard/scheduler/mark-run", response_model=SchedulerUpdateResponse)
-def mark_scheduler_run(db: Session = Depends(get_db)):
+async def mark_scheduler_run(db: AsyncSession = Depends(get_db)):
     """
     Mark that a scheduler run completed (called by WatchGuard service).
     Updates last_run and clears trigger_now flag.
     """
     try:
-        db.execute(
+        await db.execute(
             text("""
                 UPDATE watchguard_scheduler_config
                 SET last_run = NOW(), trigger_now = FALSE, updated_at = NOW(), updated_by = 'watchguard'
                 WHERE id = (SELECT id FROM watchguard_scheduler_config LIMIT 1)
             """)
         )
-        db.commit()
+        await db.commit()
         return SchedulerUpdateResponse(ok=True, message="Run marked complete")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.exception("Error marking scheduler run")
         raise HTTPException(status_code=500, detail=f"Error marking run: {str(e)}")
 
@@ -1140,7 +1710,7 @@ def mark_scheduler_run(db: Session = Depends(get_db)):
 
 
 @app.post("/alerts", response_model=AlertDispatchResponse)
-def create_alert(alert: AlertDispatchCreate, db: Session = Depends(get_db)):
+async def create_alert(alert: AlertDispatchCreate, db: AsyncSession = Depends(get_db)):
     """
     Registers a new alert dispatch.
     """
@@ -1153,23 +1723,18 @@ def create_alert(alert: AlertDispatchCreate, db: Session = Depends(get_db)):
             :change_id, :email, :dispatch_date, :country_state, :alert_count,
             :alert_type, :subject, :topic, :instance, :legislative_body, :clients
         )
-        RETURNING id, created_at
+        RETURNING id, change_id, email, dispatch_date, country_state, alert_count,
+                  alert_type, subject, topic, instance, legislative_body, clients, created_at
         """
     )
     try:
-        result = db.execute(
-            query,
-            alert.model_dump()
-        ).fetchone()
-        db.commit()
-        
-        # Return complete object
-        data = alert.model_dump()
-        data["id"] = result.id
-        data["created_at"] = result.created_at
-        return AlertDispatchResponse(**data)
+        row = (await db.execute(query, alert.model_dump())).mappings().one()
+        await db.commit()
+
+        # La fila completa ya viene del RETURNING: sin segundo model_dump ni revalidar
+        return ORJSONResponse(dict(row))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.exception("Error creating alert dispatch")
         raise HTTPException(status_code=500, detail="Error saving alert dispatch")
 
@@ -1181,10 +1746,10 @@ class AlertWithChangeResponse(AlertDispatchResponse):
 
 
 @app.get("/alerts", response_model=list[AlertWithChangeResponse])
-def get_all_alerts(
+async def get_all_alerts(
     limit: int = 100,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get all registered alerts with associated change info.
@@ -1201,12 +1766,14 @@ def get_all_alerts(
         LIMIT :limit OFFSET :offset
         """
     )
-    rows = db.execute(query, {"limit": limit, "offset": offset}).mappings().all()
-    return [AlertWithChangeResponse(**dict(r)) for r in rows]
+    # Como los listados de cambios: filas directas a orjson, sin validar ni pasar por
+    # jsonable_encoder cada alerta (response_model queda para el OpenAPI)
+    rows = (await db.execute(query, {"limit": limit, "offset": offset})).mappings().all()
+    return ORJSONResponse([dict(r) for r in rows])
 
 
 @app.get("/alerts/by-change/{change_id}", response_model=list[AlertDispatchResponse])
-def get_alerts_by_change(change_id: int, db: Session = Depends(get_db)):
+async def get_alerts_by_change(change_id: int, db: AsyncSession = Depends(get_db)):
     """
     Get all alerts registered for a specific change.
     """
@@ -1220,34 +1787,30 @@ def get_alerts_by_change(change_id: int, db: Session = Depends(get_db)):
         ORDER BY created_at DESC
         """
     )
-    rows = db.execute(query, {"change_id": change_id}).mappings().all()
-    return [AlertDispatchResponse(**dict(r)) for r in rows]
+    rows = (await db.execute(query, {"change_id": change_id})).mappings().all()
+    return ORJSONResponse([dict(r) for r in rows])
 
 
 @app.get("/alerts/stats", response_model=list[AlertStatItem])
-def get_alert_stats(year: int = 2026, db: Session = Depends(get_db)):
+async def get_alert_stats(
+    year: int = Query(2026, ge=1, le=9998),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Get total alerts count for a specific year.
     Future: expanded stats.
     """
-    dialect = db.bind.dialect.name if db.bind else "postgresql"
-    if dialect == "sqlite":
-        # SQLite uses strftime for year extraction from text/date
-        condition = "strftime('%Y', dispatch_date) = :year"
-        # Since parameter is int, logic might need casting, but let's try string comparison
-        # Actually standard sqlite date is string YYYY-MM-DD.
-        # :year is int.
-        condition = "CAST(strftime('%Y', dispatch_date) AS INTEGER) = :year"
-    else:
-        condition = "EXTRACT(YEAR FROM dispatch_date) = :year"
-
+    # Rango [1 ene, 1 ene siguiente) en lugar de EXTRACT(YEAR ...): usa
+    # idx_alert_dispatches_date (003) y sirve igual en SQLite (fechas ISO) y Postgres
     query = text(
-        f"""
+        """
         SELECT COUNT(*) as count
         FROM alert_dispatches
-        WHERE {condition}
+        WHERE dispatch_date >= :start AND dispatch_date < :end
         """
-    )
-    count = db.execute(query, {"year": year}).scalar()
+    ).bindparams(bindparam("start", type_=Date), bindparam("end", type_=Date))
+    count = (
+        await db.execute(query, {"start": date(year, 1, 1), "end": date(year + 1, 1, 1)})
+    ).scalar()
     return [AlertStatItem(year=year, count=count or 0)]
 
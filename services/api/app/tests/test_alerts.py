@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import sys
@@ -6,8 +7,13 @@ from pathlib import Path
 import unittest
 
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncSession,
+    AsyncTransaction,
+    create_async_engine,
+)
 from sqlalchemy.pool import StaticPool
 
 # Setup path to import app
@@ -22,24 +28,46 @@ from app import db as db_module  # noqa: E402
 from app.main import app  # noqa: E402
 
 
-TEST_DB_URL = "sqlite://"
+# Engine sync para fixtures y async (aiosqlite) para la app, sobre la misma DB en memoria
+TEST_DB_NAME = "file:alerts_test?mode=memory&cache=shared&uri=true"
 engine = create_engine(
-    TEST_DB_URL,
+    f"sqlite:///{TEST_DB_NAME}",
     future=True,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(
-    bind=engine, autoflush=False, autocommit=False, future=True
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{TEST_DB_NAME}",
+    poolclass=StaticPool,
 )
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+@event.listens_for(async_engine.sync_engine, "connect")
+def _disable_driver_transactions(dbapi_connection, _):
+    # El driver sqlite abre/cierra transacciones por su cuenta y rompe los SAVEPOINT:
+    # se desactiva y el BEGIN lo emite SQLAlchemy (receta de la doc de SQLAlchemy)
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(async_engine.sync_engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+# Conexión con la transacción del test en curso (ver AlertsEndpointTest.setUp)
+_test_connection: AsyncConnection | None = None
+
+
+async def override_get_db():
+    # commit()/rollback() de la app solo cierran un SAVEPOINT dentro de la transacción
+    # del test, que tearDown deshace entera
+    async with AsyncSession(
+        bind=_test_connection,
+        autoflush=False,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    ) as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[db_module.get_db] = override_get_db
@@ -74,13 +102,24 @@ CREATE TABLE alert_dispatches (
 
 INSERT_WACHET = text("INSERT INTO wachet_changes (title) VALUES (:title)")
 
+
+async def _begin_test_transaction() -> tuple[AsyncConnection, AsyncTransaction]:
+    connection = await async_engine.connect()
+    return connection, await connection.begin()
+
+
+async def _rollback_test_transaction(
+    connection: AsyncConnection, transaction: AsyncTransaction
+) -> None:
+    await transaction.rollback()
+    await connection.close()
+
+
 class AlertsEndpointTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         cls.client = TestClient(app)
-
-    def setUp(self):
-        # Re-create tables before each test
+        # Esquema y datos base una sola vez; cada test corre dentro de una transacción
         with engine.begin() as conn:
             conn.execute(text("DROP TABLE IF EXISTS alert_dispatches"))
             conn.execute(text("DROP TABLE IF EXISTS wachet_changes"))
@@ -88,6 +127,16 @@ class AlertsEndpointTest(unittest.TestCase):
             conn.execute(text(CREATE_ALERTS_TABLE))
             conn.execute(INSERT_WACHET, {"title": "Test Change"})
 
+    def setUp(self):
+        global _test_connection
+        _test_connection, self._transaction = asyncio.run(_begin_test_transaction())
+
+    def tearDown(self):
+        global _test_connection
+        # Deshace todo lo que escribió el test (incluido el AUTOINCREMENT de sqlite_sequence)
+        asyncio.run(_rollback_test_transaction(_test_connection, self._transaction))
+        _test_connection = None
+
     def test_create_alert(self):
         payload = {
             "change_id": 1,
@@ -151,6 +200,23 @@ class AlertsEndpointTest(unittest.TestCase):
         self.assertEqual(stats[0]["year"], 2026)
         self.assertEqual(stats[0]["count"], 2)
 
+    def test_get_stats_year_boundaries(self):
+        payload = {
+            "change_id": 1,
+            "email": "test@example.com",
+            "country_state": "México",
+            "alert_type": "Regulatoria",
+            "subject": "Bancario",
+            "topic": "Topic A",
+            "instance": "X"
+        }
+        for dispatch_date in ("2025-12-31", "2026-01-01", "2026-12-31", "2027-01-01"):
+            self.client.post("/alerts", json={**payload, "dispatch_date": dispatch_date})
+
+        response = self.client.get("/alerts/stats?year=2026")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["count"], 2)
+
 
 if __name__ == "__main__":
     unittest.main()
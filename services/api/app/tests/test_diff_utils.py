@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from app.diff_utils import compute_diff, compute_diffs  # noqa: E402
+
+
+class ComputeDiffTest(unittest.TestCase):
+    def test_unified_format_with_context(self):
+        diff = compute_diff("Line 1\nLine 2\nLine 3", "Line 1\nLine 2 modified\nLine 3\nLine 4 new")
+        self.assertEqual(
+            diff.splitlines(),
+            [
+                "--- previous",
+                "+++ current",
+                "@@ -1,3 +1,4 @@",
+                " Line 1",
+                "-Line 2",
+                "+Line 2 modified",
+                " Line 3",
+                "+Line 4 new",
+            ],
+        )
+
+    def test_distant_changes_produce_separate_hunks(self):
+        prev = "\n".join(f"linea {i}" for i in range(30))
+        curr = prev.replace("linea 2\n", "linea 2 cambiada\n").replace("linea 25", "linea 25 cambiada")
+        diff = compute_diff(prev, curr)
+        hunks = [line for line in diff.splitlines() if line.startswith("@@")]
+        self.assertEqual(hunks, ["@@ -1,6 +1,6 @@", "@@ -23,7 +23,7 @@"])
+
+    def test_identical_or_trailing_newline_only_returns_none(self):
+        self.assertIsNone(compute_diff("a\nb", "a\nb"))
+        self.assertIsNone(compute_diff("a\nb", "a\nb\n"))
+        self.assertIsNone(compute_diff("", ""))
+
+    def test_empty_side_is_full_insert_or_delete(self):
+        self.assertEqual(
+            compute_diff("", "nuevo\ntexto").splitlines(),
+            ["--- previous", "+++ current", "@@ -0,0 +1,2 @@", "+nuevo", "+texto"],
+        )
+        self.assertEqual(
+            compute_diff("viejo", "").splitlines(),
+            ["--- previous", "+++ current", "@@ -1 +0,0 @@", "-viejo"],
+        )
+
+    def test_change_inside_very_long_line_stays_local(self):
+        prev = " ".join(f"tok{i}" for i in range(5000))
+        curr = prev.replace("tok2500 ", "tokCAMBIO ")
+        diff = compute_diff(prev, curr)
+        self.assertIn("tokCAMBIO", diff)
+        # Solo el trozo cambiado y su contexto, no la línea entera (~40k caracteres)
+        self.assertLess(len(diff), 2000)
+
+    def test_huge_changed_region_is_replaced_without_diffing(self):
+        prev = "cabecera\n" + "\n".join(f"viejo {i}" for i in range(30000)) + "\npie"
+        curr = "cabecera\n" + "\n".join(f"nuevo {i}" for i in range(30000)) + "\npie"
+        lines = compute_diff(prev, curr).splitlines()
+        self.assertEqual(lines[2], "@@ -1,30002 +1,30002 @@")
+        self.assertEqual(lines[3], " cabecera")
+        # Todo el bloque viejo borrado y luego todo el nuevo insertado, sin intercalar
+        self.assertEqual(lines[4:30004], [f"-viejo {i}" for i in range(30000)])
+        self.assertEqual(lines[-1], " pie")
+
+    def test_batch_with_short_timeout_matches_single_diffs(self):
+        pairs = [("a\nb\nc", "a\nB\nc"), ("igual", "igual"), ("", "nuevo")]
+        self.assertEqual(
+            compute_diffs(pairs, timeout=0.1),
+            [compute_diff(prev, curr) for prev, curr in pairs],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import sys
@@ -5,8 +6,13 @@ from pathlib import Path
 import unittest
 
 from fastapi.testclient import TestClient
-from sqlalchemy import bindparam, create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncSession,
+    AsyncTransaction,
+    create_async_engine,
+)
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.types import JSON
 
@@ -19,30 +25,74 @@ sys.modules.pop("app.main", None)
 os.environ.setdefault("DATABASE_URL", "sqlite:///./test_api.db")
 
 from app import db as db_module  # noqa: E402
+from app import main as main_module  # noqa: E402
 from app.main import app  # noqa: E402
 
 
-TEST_DB_URL = "sqlite://"
+# Base en memoria compartida: el engine sync prepara los fixtures y el
+# engine async (aiosqlite) es el que usa la app, ambos sobre la misma DB.
+TEST_DB_NAME = "file:wachet_changes_test?mode=memory&cache=shared&uri=true"
 engine = create_engine(
-    TEST_DB_URL,
+    f"sqlite:///{TEST_DB_NAME}",
     future=True,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(
-    bind=engine, autoflush=False, autocommit=False, future=True
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{TEST_DB_NAME}",
+    poolclass=StaticPool,
 )
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_now(dbapi_connection, _):
+    # SQLite no tiene NOW(); la API lo usa en los UPDATE
+    dbapi_connection.create_function("NOW", 0, lambda: "2026-01-01 00:00:00")
+    # El driver sqlite abre/cierra transacciones por su cuenta y rompe los SAVEPOINT:
+    # se desactiva y el BEGIN lo emite SQLAlchemy (receta de la doc de SQLAlchemy)
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(async_engine.sync_engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+# Conexión con la transacción del test en curso (ver TransactionalTestCase)
+_test_connection: AsyncConnection | None = None
+
+
+def TestingSessionLocal() -> AsyncSession:
+    # commit()/rollback() de la app solo cierran un SAVEPOINT dentro de la transacción
+    # del test, que tearDown deshace entera
+    return AsyncSession(
+        bind=_test_connection,
+        autoflush=False,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+
+
+async def override_get_db():
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+        # Libera el SAVEPOINT de la petición: deshacerlo al cerrar arrastraría lo que
+        # la background task guardó dentro de él (corre antes de salir de get_db)
+        await db.commit()
 
 
 app.dependency_overrides[db_module.get_db] = override_get_db
+# El save-on-read corre en background con su propia sesión, fuera de get_db
+main_module.SessionLocal = TestingSessionLocal
+
+
+def run_sql(statement, params=None):
+    """
+    Fixtures y comprobaciones dentro de la transacción del test (resultado ya leído).
+    Con una lista de params es un executemany: una sola vuelta por el event loop.
+    """
+    return asyncio.run(_test_connection.execute(statement, params))
+
 
 CREATE_TABLE_SQL = """
 CREATE TABLE wachet_changes (
@@ -84,6 +134,35 @@ INSERT_SQL = text(
     """
 ).bindparams(bindparam("raw_notification", type_=JSON))
 
+# Fila de wachet_changes por defecto: cada test pasa solo los campos que le importan
+CHANGE_DEFAULTS = {
+    "wachet_id": "w-test",
+    "wachete_notification_id": None,
+    "url": "https://example.test/page",
+    "title": "Cambio de ejemplo",
+    "importance": None,
+    "ai_score": None,
+    "ai_reason": None,
+    "headline": None,
+    "source_name": None,
+    "source_country": None,
+    "status": "NEW",
+    "raw_content": None,
+    "raw_notification": None,
+    "previous_text": None,
+    "current_text": None,
+    "diff_text": None,
+    "change_hash": None,
+}
+
+
+def change_params(**overrides) -> dict:
+    return {**CHANGE_DEFAULTS, **overrides}
+
+
+def insert_change(**overrides) -> None:
+    run_sql(INSERT_SQL, change_params(**overrides))
+
 
 CREATE_TABLE_SQL_MINIMAL = """
 CREATE TABLE wachet_changes (
@@ -123,25 +202,66 @@ INSERT_SQL_MINIMAL = text(
 ).bindparams(bindparam("raw_notification", type_=JSON))
 
 
-def recreate_table(sql: str):
+# Un solo TestClient para todo el módulo (setUpModule), compartido por las clases
+client: TestClient | None = None
+
+
+def setUpModule():
+    global client
+    client = TestClient(app)
+    # Esquema completo una sola vez; cada test corre dentro de una transacción
     with engine.begin() as conn:
         conn.execute(text("DROP TABLE IF EXISTS wachet_changes"))
-        conn.execute(text(sql))
+        conn.execute(text(CREATE_TABLE_SQL))
 
 
-class WachetChangesEndpointTest(unittest.TestCase):
-    @classmethod
-    def setUpClass(cls):
-        recreate_table(CREATE_TABLE_SQL)
-        cls.client = TestClient(app)
+def tearDownModule():
+    client.close()
+    engine.dispose()
+
+
+def recreate_table(sql: str):
+    """Otro esquema solo para este test: el DDL de SQLite también se deshace en tearDown."""
+    run_sql(text("DROP TABLE wachet_changes"))
+    run_sql(text(sql))
+    main_module._columns_cache.clear()
+
+
+async def _begin_test_transaction() -> tuple[AsyncConnection, AsyncTransaction]:
+    connection = await async_engine.connect()
+    return connection, await connection.begin()
+
+
+async def _rollback_test_transaction(
+    connection: AsyncConnection, transaction: AsyncTransaction
+) -> None:
+    await transaction.rollback()
+    await connection.close()
+
+
+class TransactionalTestCase(unittest.TestCase):
+    """Cada test en una transacción que tearDown deshace (datos, esquema y AUTOINCREMENT)."""
 
     @classmethod
-    def tearDownClass(cls):
-        cls.client.close()
-        engine.dispose()
+    def setUpClass(cls):
+        cls.client = client
 
     def setUp(self):
-        recreate_table(CREATE_TABLE_SQL)
+        global _test_connection
+        _test_connection, self._transaction = asyncio.run(_begin_test_transaction())
+        main_module._columns_cache.clear()
+        main_module._summary_cache.clear()
+        main_module.clear_diff_cache()
+
+    def tearDown(self):
+        global _test_connection
+        asyncio.run(_rollback_test_transaction(_test_connection, self._transaction))
+        _test_connection = None
+        # Las caches pueden haber visto el esquema o los datos del test
+        main_module._columns_cache.clear()
+
+
+class WachetChangesEndpointTest(TransactionalTestCase):
 
     def test_returns_raw_notification_and_raw_content(self):
         raw_notification_dict = {"foo": "bar", "nested": {"value": 1}}
@@ -166,8 +286,7 @@ class WachetChangesEndpointTest(unittest.TestCase):
             "change_hash": "hash-123",
         }
 
-        with engine.begin() as conn:
-            conn.execute(INSERT_SQL, params)
+        run_sql(INSERT_SQL, params)
 
         response = self.client.get("/wachet-changes")
         self.assertEqual(response.status_code, 200)
@@ -180,6 +299,27 @@ class WachetChangesEndpointTest(unittest.TestCase):
         self.assertEqual(item["wachet_id"], "w1")
         self.assertEqual(item["wachete_notification_id"], "notif-1")
 
+    def test_include_raw_false_omits_raw_fields_until_detail(self):
+        raw_notification_dict = {"comparand": "antes", "current": "despues"}
+        raw_content = json.dumps(raw_notification_dict)
+        insert_change(raw_content=raw_content, raw_notification=raw_notification_dict)
+
+        response = self.client.get("/wachet-changes", params={"include_raw": "false"})
+        self.assertEqual(response.status_code, 200)
+        item = response.json()["items"][0]
+        self.assertIsNone(item["raw_content"])
+        self.assertIsNone(item["raw_notification"])
+        # raw_notification se sigue leyendo para derivar los textos
+        self.assertEqual(item["previous_text"], "antes")
+        self.assertEqual(item["current_text"], "despues")
+
+        detail = self.client.get(f"/wachet-changes/{item['id']}")
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.json()["raw_notification"], raw_notification_dict)
+        self.assertEqual(detail.json()["raw_content"], raw_content)
+
+        self.assertEqual(self.client.get("/wachet-changes/999999").status_code, 404)
+
     def test_handles_missing_optional_columns(self):
         recreate_table(CREATE_TABLE_SQL_MINIMAL)
 
@@ -201,8 +341,7 @@ class WachetChangesEndpointTest(unittest.TestCase):
             "change_hash": "hash-456",
         }
 
-        with engine.begin() as conn:
-            conn.execute(INSERT_SQL_MINIMAL, params)
+        run_sql(INSERT_SQL_MINIMAL, params)
 
         response = self.client.get("/wachet-changes")
         self.assertEqual(response.status_code, 200)
@@ -217,29 +356,306 @@ class WachetChangesEndpointTest(unittest.TestCase):
         self.assertIsNone(item["source_name"])
         self.assertIsNone(item["source_country"])
 
+    def test_limit_and_offset_paginate_results(self):
+        run_sql(
+            INSERT_SQL,
+            [
+                change_params(title=f"Cambio {i}", diff_text="diff")
+                for i in range(3)
+            ],
+        )
+
+        first_page = self.client.get("/wachet-changes", params={"limit": 2}).json()
+        second_page = self.client.get("/wachet-changes", params={"limit": 2, "offset": 2}).json()
+
+        self.assertEqual(first_page["total"], 2)
+        self.assertEqual(second_page["total"], 1)
+        ids = {item["id"] for item in first_page["items"] + second_page["items"]}
+        self.assertEqual(len(ids), 3)
+
+        response = self.client.get("/wachet-changes", params={"limit": 501})
+        self.assertEqual(response.status_code, 422)
+
+    def test_fts_search_falls_back_to_substring_without_tsvector_column(self):
+        # SQLite no tiene ILIKE ni tsvector: se comprueba el SQL generado
+        columns = frozenset({"title", "ai_reason", "url"})
+        fallback = main_module._build_list_query(columns, has_search=True, search_fts=True)
+        self.assertIn("title ILIKE :q", fallback)
+        self.assertNotIn("search_tsv", fallback)
+
+        fts = main_module._build_list_query(
+            columns | {"search_tsv"}, has_search=True, search_fts=True
+        )
+        self.assertIn("search_tsv @@ websearch_to_tsquery('spanish', :search)", fts)
+        self.assertNotIn("ILIKE", fts)
+
+        response = self.client.get("/wachet-changes", params={"search": "x", "mode": "regex"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_cursor_pages_through_rows_with_same_created_at(self):
+        run_sql(
+            INSERT_SQL,
+            [
+                change_params(title=f"Cambio {i}", diff_text="diff")
+                for i in range(5)
+            ],
+        )
+        # Mismo created_at en todas: el id tiene que desempatar
+        run_sql(text("UPDATE wachet_changes SET created_at = '2026-01-01 10:00:00'"))
+
+        seen: list[int] = []
+        params: dict[str, object] = {"limit": 2}
+        while True:
+            page = self.client.get("/wachet-changes", params=params).json()
+            seen.extend(item["id"] for item in page["items"])
+            if page["next_cursor"] is None:
+                break
+            params = {
+                "limit": 2,
+                "cursor": page["next_cursor"],
+                "cursor_id": page["next_cursor_id"],
+            }
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_streams_rows_across_chunks(self):
+        run_sql(
+            INSERT_SQL,
+            [
+                change_params(previous_text=f"antes {i}", current_text=f"despues {i}")
+                for i in range(5)
+            ],
+        )
+
+        chunk_rows = main_module.LIST_STREAM_CHUNK_ROWS
+        main_module.LIST_STREAM_CHUNK_ROWS = 2
+        # Fuerza el pool de procesos aunque los textos sean cortos
+        pool_min_chars = main_module.DIFF_POOL_MIN_CHARS
+        main_module.DIFF_POOL_MIN_CHARS = 0
+        try:
+            payload = self.client.get("/wachet-changes").json()
+        finally:
+            main_module.LIST_STREAM_CHUNK_ROWS = chunk_rows
+            main_module.DIFF_POOL_MIN_CHARS = pool_min_chars
+
+        self.assertEqual(payload["total"], 5)
+        self.assertEqual(len({item["id"] for item in payload["items"]}), 5)
+        self.assertTrue(all(item["diff_text"] for item in payload["items"]))
+
+    def test_backfill_diffs_persists_missing_diffs_in_pages(self):
+        run_sql(
+            INSERT_SQL,
+            [
+                change_params(
+                    raw_notification={"comparand": "antes", "current": f"despues {i}"},
+                    diff_text="ya calculado" if i == 0 else None,
+                )
+                for i in range(3)
+            ],
+        )
+
+        first = self.client.post("/wachet-changes/backfill-diffs", params={"limit": 1}).json()
+        self.assertEqual(first["updated"], 1)
+        second = self.client.post(
+            "/wachet-changes/backfill-diffs", params={"after_id": first["next_after_id"]}
+        ).json()
+        self.assertEqual(second, {"ok": True, "updated": 1, "next_after_id": None})
+
+        rows = run_sql(
+            text("SELECT previous_text, current_text, diff_text FROM wachet_changes ORDER BY id")
+        ).all()
+        self.assertEqual(rows[0], (None, None, "ya calculado"))
+        for prev, curr, diff in rows[1:]:
+            self.assertEqual(prev, "antes")
+            self.assertTrue(curr.startswith("despues"))
+            self.assertIn("+despues", diff)
+
+    def test_backfill_diffs_reports_failed_write(self):
+        run_sql(
+            text(
+                "INSERT INTO wachet_changes (wachet_id, status, previous_text, current_text) "
+                "VALUES ('w-backfill-fail', 'NEW', 'antes', 'despues')"
+            )
+        )
+        # El UPDATE falla: el endpoint no puede contar la fila como guardada
+        run_sql(
+            text(
+                "CREATE TRIGGER wachet_changes_read_only BEFORE UPDATE ON wachet_changes "
+                "BEGIN SELECT RAISE(ABORT, 'read only'); END"
+            )
+        )
+
+        response = self.client.post("/wachet-changes/backfill-diffs")
+        self.assertEqual(response.status_code, 500)
+        self.assertIsNone(
+            run_sql(text("SELECT diff_text FROM wachet_changes")).scalar_one()
+        )
+
+        too_big = self.client.post("/wachet-changes/backfill-diffs", params={"limit": 501})
+        self.assertEqual(too_big.status_code, 422)
+
+    def test_filtered_endpoint_returns_only_filtered_and_pending(self):
+        run_sql(
+            text("INSERT INTO wachet_changes (wachet_id, status) VALUES (:wachet_id, :status)"),
+            [
+                {"wachet_id": f"w-filtered-{i}", "status": status}
+                for i, status in enumerate(("NEW", "FILTERED", "PENDING", "VALIDATED"))
+            ],
+        )
+
+        payload = self.client.get("/wachet-changes/filtered").json()
+        self.assertEqual(payload["total"], 2)
+        self.assertEqual({item["status"] for item in payload["items"]}, {"FILTERED", "PENDING"})
+
+    def test_rejects_unknown_status_and_importance_filters(self):
+        self.assertEqual(self.client.get("/wachet-changes", params={"status": "ERROR"}).status_code, 200)
+        self.assertEqual(self.client.get("/wachet-changes", params={"status": "nuevo"}).status_code, 422)
+        self.assertEqual(
+            self.client.get("/wachet-changes", params={"importance": "MAYBE"}).status_code, 422
+        )
+        self.assertEqual(
+            self.client.get("/wachet-changes/filtered", params={"importance": "MAYBE"}).status_code,
+            422,
+        )
+
+    def test_update_status_returns_updated_row(self):
+        insert_change(
+            title="Cambio a validar",
+            importance="IMPORTANT",
+            ai_score=0.8,
+            ai_reason="Reforma",
+            status="FILTERED",
+        )
+        change_id = run_sql(text("SELECT id FROM wachet_changes")).scalar()
+
+        response = self.client.patch(f"/wachet-changes/{change_id}", json={"status": "VALIDATED"})
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload["status"], "VALIDATED")
+        self.assertEqual(payload["item"]["id"], change_id)
+        self.assertEqual(payload["item"]["status"], "VALIDATED")
+        self.assertEqual(payload["item"]["title"], "Cambio a validar")
+        self.assertIsNotNone(payload["item"]["updated_at"])
+        self.assertEqual(
+            run_sql(text("SELECT status FROM wachet_changes WHERE id = :id"), {"id": change_id}).scalar(),
+            "VALIDATED",
+        )
+
+        missing = self.client.patch("/wachet-changes/999999", json={"status": "VALIDATED"})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_summary_uses_counters_table_when_available(self):
+        run_sql(
+            text(
+                "INSERT INTO wachet_changes (wachet_id, status, importance) "
+                "VALUES (:wachet_id, :status, :importance)"
+            ),
+            [
+                {"wachet_id": f"w-sum-{i}", "status": status, "importance": importance}
+                for i, (status, importance) in enumerate(
+                    [("NEW", None), ("FILTERED", "IMPORTANT"), ("FILTERED", "IMPORTANT")]
+                )
+            ],
+        )
+
+        # Sin migración 007: GROUP BY sobre wachet_changes
+        payload = self.client.get("/wachet-changes/summary").json()
+        self.assertEqual(payload["total"], 3)
+        self.assertIn({"status": "FILTERED", "importance": "IMPORTANT", "total": 2}, payload["items"])
+        self.assertIn({"status": "NEW", "importance": None, "total": 1}, payload["items"])
+
+        run_sql(
+            text(
+                "CREATE TABLE wachet_changes_counters ("
+                "status TEXT NOT NULL DEFAULT '', importance TEXT NOT NULL DEFAULT '', "
+                "total INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (status, importance))"
+            )
+        )
+        run_sql(
+            text(
+                "INSERT INTO wachet_changes_counters VALUES "
+                "('NEW', '', 5), ('VALIDATED', 'IMPORTANT', 7), ('DISCARDED', '', 0)"
+            )
+        )
+        main_module._summary_cache.clear()
+        try:
+            payload = self.client.get("/wachet-changes/summary").json()
+        finally:
+            run_sql(text("DROP TABLE wachet_changes_counters"))
+
+        self.assertEqual(payload["total"], 12)
+        self.assertEqual(
+            payload["items"],
+            [
+                {"status": "NEW", "importance": None, "total": 5},
+                {"status": "VALIDATED", "importance": "IMPORTANT", "total": 7},
+            ],
+        )
+
+    def test_summary_etag_returns_not_modified_until_status_changes(self):
+        run_sql(
+            text("INSERT INTO wachet_changes (wachet_id, status) VALUES ('w-etag', 'NEW')")
+        )
+        change_id = run_sql(text("SELECT id FROM wachet_changes")).scalar_one()
+
+        first = self.client.get("/wachet-changes/summary")
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["etag"]
+        self.assertEqual(first.headers["cache-control"], "no-cache")
+
+        again = self.client.get("/wachet-changes/summary", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+
+        self.client.patch(f"/wachet-changes/{change_id}", json={"status": "VALIDATED"})
+        changed = self.client.get("/wachet-changes/summary", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+        self.assertEqual(changed.json()["items"][0]["status"], "VALIDATED")
+
+    def test_count_without_counters_table_falls_back_to_count(self):
+        run_sql(
+            text("INSERT INTO wachet_changes (wachet_id, status) VALUES (:wachet_id, 'NEW')"),
+            [
+                {"wachet_id": f"w-count-{i}"}
+                for i in range(3)
+            ],
+        )
+
+        main_module._count_cache.clear()
+        try:
+            payload = self.client.get("/wachet-changes/count").json()
+        finally:
+            main_module._count_cache.clear()
+
+        # SQLite: sin reltuples, COUNT(*) exacto
+        self.assertEqual(payload, {"count": 3})
+
+    def test_exact_count_bypasses_cache(self):
+        run_sql(text("INSERT INTO wachet_changes (wachet_id, status) VALUES ('w-exact', 'NEW')"))
+
+        main_module._count_cache["count"] = (42, main_module.time.time())
+        try:
+            cached = self.client.get("/wachet-changes/count").json()
+            exact = self.client.get("/wachet-changes/count", params={"exact": "true"}).json()
+        finally:
+            main_module._count_cache.clear()
+
+        self.assertEqual(cached, {"count": 42})
+        self.assertEqual(exact, {"count": 1})
+
 
 if __name__ == "__main__":
     unittest.main()
 
 
-class WachetChangesDiffFallbackTest(unittest.TestCase):
+class WachetChangesDiffFallbackTest(TransactionalTestCase):
     """
     Tests for fallback logic that derives previous_text/current_text from raw_notification
     when DB columns are null or missing.
     """
 
-    @classmethod
-    def setUpClass(cls):
-        recreate_table(CREATE_TABLE_SQL)
-        cls.client = TestClient(app)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.client.close()
-
-    def setUp(self):
-        recreate_table(CREATE_TABLE_SQL)
-
     def test_derives_before_after_from_raw_notification(self):
         """
         When previous_text and current_text are NULL in DB,
@@ -270,8 +686,7 @@ class WachetChangesDiffFallbackTest(unittest.TestCase):
             "change_hash": "hash-derive",
         }
 
-        with engine.begin() as conn:
-            conn.execute(INSERT_SQL, params)
+        run_sql(INSERT_SQL, params)
 
         response = self.client.get("/wachet-changes")
         self.assertEqual(response.status_code, 200)
@@ -287,6 +702,39 @@ class WachetChangesDiffFallbackTest(unittest.TestCase):
         self.assertIn("-This is the previous content", item["diff_text"])
         self.assertIn("+This is the current content", item["diff_text"])
 
+    def test_backfills_derived_fields_after_response(self):
+        """
+        The GET only reads; derived previous/current are persisted afterwards by a
+        background task. The list diff (short timeout) is shown but not persisted.
+        """
+        insert_change(raw_notification={"comparand": "Old text", "current": "New text"})
+
+        # TestClient ejecuta las background tasks antes de devolver la respuesta
+        response = self.client.get("/wachet-changes")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("+New text", response.json()["items"][0]["diff_text"])
+
+        row = run_sql(
+            text("SELECT previous_text, current_text, diff_text FROM wachet_changes")
+        ).mappings().one()
+        self.assertEqual(row["previous_text"], "Old text")
+        self.assertEqual(row["current_text"], "New text")
+        # El diff lo guarda backfill-diffs, con el timeout completo
+        self.assertIsNone(row["diff_text"])
+
+    def test_skips_list_diff_for_oversized_texts(self):
+        insert_change(previous_text="a" * 60, current_text="b" * 60)
+
+        max_chars = main_module.LIST_DIFF_MAX_CHARS
+        main_module.LIST_DIFF_MAX_CHARS = 100
+        try:
+            item = self.client.get("/wachet-changes").json()["items"][0]
+        finally:
+            main_module.LIST_DIFF_MAX_CHARS = max_chars
+
+        self.assertIsNone(item["diff_text"])
+        self.assertEqual(item["previous_text"], "a" * 60)
+
     def test_uses_db_values_when_present(self):
         """
         When previous_text and current_text are present in DB,
@@ -316,8 +764,7 @@ class WachetChangesDiffFallbackTest(unittest.TestCase):
             "change_hash": "hash-db-values",
         }
 
-        with engine.begin() as conn:
-            conn.execute(INSERT_SQL, params)
+        run_sql(INSERT_SQL, params)
 
         response = self.client.get("/wachet-changes")
         self.assertEqual(response.status_code, 200)
@@ -358,8 +805,7 @@ class WachetChangesDiffFallbackTest(unittest.TestCase):
             "change_hash": "hash-diff-compute",
         }
 
-        with engine.begin() as conn:
-            conn.execute(INSERT_SQL, params)
+        run_sql(INSERT_SQL, params)
 
         response = self.client.get("/wachet-changes")
         self.assertEqual(response.status_code, 200)
@@ -373,7 +819,7 @@ class WachetChangesDiffFallbackTest(unittest.TestCase):
         self.assertIn("+Line 4 new", item["diff_text"])
 
 
-class WachetChangesMissingDiffColumnsTest(unittest.TestCase):
+class WachetChangesMissingDiffColumnsTest(TransactionalTestCase):
     """
     Tests for endpoint behavior when diff columns (previous_text, current_text, diff_text)
     don't exist in the database schema.
@@ -416,17 +862,8 @@ class WachetChangesMissingDiffColumnsTest(unittest.TestCase):
         """
     ).bindparams(bindparam("raw_notification", type_=JSON))
 
-    @classmethod
-    def setUpClass(cls):
-        recreate_table(cls.CREATE_TABLE_NO_DIFF)
-        cls.client = TestClient(app)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.client.close()
-        recreate_table(CREATE_TABLE_SQL)  # Restore full schema
-
     def setUp(self):
+        super().setUp()
         recreate_table(self.CREATE_TABLE_NO_DIFF)
 
     def test_endpoint_works_without_diff_columns(self):
@@ -456,8 +893,7 @@ class WachetChangesMissingDiffColumnsTest(unittest.TestCase):
             "change_hash": "hash-no-diff-cols",
         }
 
-        with engine.begin() as conn:
-            conn.execute(self.INSERT_NO_DIFF, params)
+        run_sql(self.INSERT_NO_DIFF, params)
 
         response = self.client.get("/wachet-changes")
         self.assertEqual(response.status_code, 200)
@@ -471,6 +907,49 @@ class WachetChangesMissingDiffColumnsTest(unittest.TestCase):
         # Diff should be computed
         self.assertIsNotNone(item["diff_text"])
 
+    def test_repeated_list_reuses_cached_diff(self):
+        run_sql(
+            self.INSERT_NO_DIFF,
+            change_params(raw_notification={"comparand": "Antes", "current": "Despues"}),
+        )
+
+        calls = []
+        run_diffs = main_module.run_diffs
+
+        async def counting_run_diffs(pairs, *args):
+            calls.append(len(pairs))
+            return await run_diffs(pairs, *args)
+
+        main_module.run_diffs = counting_run_diffs
+        try:
+            first = self.client.get("/wachet-changes").json()["items"][0]
+            second = self.client.get("/wachet-changes").json()["items"][0]
+        finally:
+            main_module.run_diffs = run_diffs
+
+        # Sin columnas de diff no se puede guardar: la segunda carga sale de la cache
+        self.assertEqual(calls, [1])
+        self.assertEqual(second["diff_text"], first["diff_text"])
+
+    def test_diff_cache_is_bounded_by_size_and_keeps_recent_hits(self):
+        max_chars = main_module.DIFF_CACHE_MAX_CHARS
+        main_module.DIFF_CACHE_MAX_CHARS = 20
+        try:
+            main_module.remember_diff((b"a", b"a"), "x" * 10)
+            main_module.remember_diff((b"b", b"b"), "y" * 10)
+            # Diffs grandes no se guardan
+            main_module.remember_diff((b"big", b"big"), "z" * (main_module.DIFF_CACHE_MAX_DIFF_CHARS + 1))
+            # El acierto mueve "a" al final: al pasarse del tope sale "b"
+            self.assertEqual(main_module.cached_diff((b"a", b"a")), (True, "x" * 10))
+            main_module.remember_diff((b"c", b"c"), "w" * 10)
+        finally:
+            main_module.DIFF_CACHE_MAX_CHARS = max_chars
+
+        self.assertEqual(main_module.cached_diff((b"big", b"big")), (False, None))
+        self.assertEqual(main_module.cached_diff((b"b", b"b")), (False, None))
+        self.assertEqual(main_module.cached_diff((b"a", b"a")), (True, "x" * 10))
+        self.assertEqual(main_module.cached_diff((b"c", b"c")), (True, "w" * 10))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,64 +1,135 @@
 import os
-from typing import Dict
+from dataclasses import dataclass
 
-import requests
+import httpx
+import orjson
 
 # Dentro de la red de Docker, el servicio se llama "ai-filter"
 DEFAULT_AI_FILTER_BASE_URL = "http://ai-filter:8100"
 AI_FILTER_BASE_URL = os.getenv("AI_FILTER_BASE_URL", DEFAULT_AI_FILTER_BASE_URL)
 
-session = requests.Session()
+# Conexiones (keep-alive) del pool hacia AI Filter
+AI_FILTER_MAX_CONNECTIONS = int(os.getenv("AI_FILTER_MAX_CONNECTIONS", "16"))
+AI_FILTER_TIMEOUT_SECONDS = 30
+
+# /classify/many: como máximo tantos cambios por petición como llamadas en paralelo
+# hace ai-filter (su CLASSIFY_MANY_CONCURRENCY), así todo el lote va en una sola tanda
+AI_FILTER_MANY_BATCH_SIZE = int(os.getenv("AI_FILTER_MANY_BATCH_SIZE", "10"))
+# Presupuesto de ai-filter por cambio: OPENAI_MAX_ATTEMPTS intentos de hasta 60 s
+# (timeout del cliente de OpenAI) con esperas de hasta 30 s entre ellos, más margen.
+# Con un timeout menor, una racha de 429 cortaría la petición y marcaría como ERROR
+# cambios que el servidor sí clasificó
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "5"))
+AI_FILTER_BATCH_TIMEOUT_SECONDS = OPENAI_MAX_ATTEMPTS * 60 + (OPENAI_MAX_ATTEMPTS - 1) * 30 + 30
+
+# Se crea con la primera llamada, dentro del event loop del worker (asyncio.run en main)
+_client: httpx.AsyncClient | None = None
 
 
 class AIFilterError(Exception):
     pass
 
 
-def classify_change(
-    title: str | None,
-    diff_text: str,
-    url: str | None = None,
-    current_snippet: str | None = None,
-    previous_text: str | None = None,
-    current_text: str | None = None,
-    task_name: str | None = None,
-    timestamp: str | None = None,
-) -> Dict:
+@dataclass(slots=True)
+class ClassifyResult:
+    """Clasificación de un cambio, con los valores por defecto ya aplicados."""
+
+    importance: str
+    score: float
+    reason: str
+    headline: str  # idea principal
+    source_name: str  # institución
+    source_country: str  # país
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Cliente compartido con keep-alive: las llamadas reutilizan conexiones en lugar de
+    abrir una por cambio. HTTP/1.1: uvicorn (ai-filter) no habla HTTP/2.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=AI_FILTER_BASE_URL,
+            limits=httpx.Limits(
+                max_connections=AI_FILTER_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_FILTER_MAX_CONNECTIONS,
+            ),
+            timeout=AI_FILTER_TIMEOUT_SECONDS,
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def classify_changes(items: list[dict]) -> list[ClassifyResult | AIFilterError]:
     """
-    Llama al servicio AI Filter y devuelve un dict con:
-      - importance
-      - score
-      - reason
-      - headline (idea principal)
-      - source_name (institución)
-      - source_country (país)
+    Clasifica un lote con /classify/many (mismo prompt que /classify, una llamada al
+    modelo por cambio en el servidor), en peticiones de AI_FILTER_MANY_BATCH_SIZE
+    cambios. Cada item es el dict de build_classify_kwargs (campos de ChangeInput).
+    Devuelve, en el mismo orden, el ClassifyResult o un AIFilterError para los cambios que
+    fallaron; si falla una petición, solo sus cambios quedan con error.
     """
-    payload = {
-        "title": title,
-        "diff_text": diff_text,
-        "current_snippet": current_snippet,
-        "previous_text": previous_text,
-        "current_text": current_text,
-        "url": url,
-        "task_name": task_name,
-        "timestamp": timestamp,
-    }
-
-    url_endpoint = f"{AI_FILTER_BASE_URL}/classify"
-
-    resp = session.post(url_endpoint, json=payload, timeout=30)
+    results: list[ClassifyResult | AIFilterError] = []
+    for start in range(0, len(items), AI_FILTER_MANY_BATCH_SIZE):
+        results.extend(await _classify_many(items[start:start + AI_FILTER_MANY_BATCH_SIZE]))
+    return results
+
+
+async def _classify_many(items: list[dict]) -> list[ClassifyResult | AIFilterError]:
+    try:
+        data = await _post("/classify/many", {"items": items}, AI_FILTER_BATCH_TIMEOUT_SECONDS)
+    except AIFilterError as e:
+        return [e] * len(items)
+
+    results: list[ClassifyResult | AIFilterError] = [
+        AIFilterError("AI Filter no devolvió resultado") for _ in items
+    ]
+    for entry in data.get("items", []):
+        index = entry.get("index")
+        if not isinstance(index, int) or not 0 <= index < len(items):
+            continue
+        if entry.get("result") is not None:
+            results[index] = _classification(entry["result"])
+        else:
+            results[index] = AIFilterError(f"Error en AI Filter: {entry.get('error')}")
+    return results
+
+
+async def _post(path: str, payload: dict, timeout: float) -> dict:
+    try:
+        # orjson en lugar del json de la stdlib al serializar (diffs y textos largos)
+        resp = await get_client().post(
+            path,
+            content=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+        )
+    except httpx.HTTPError as e:
+        # Red/timeout: el cambio queda en ERROR y se reintenta, no tumba el lote
+        raise AIFilterError(f"Error llamando a AI Filter: {e!r}") from e
     try:
         resp.raise_for_status()
     except Exception as e:
         raise AIFilterError(f"Error llamando a AI Filter: {e}, body={resp.text}") from e
+    try:
+        return orjson.loads(resp.content)
+    except orjson.JSONDecodeError as e:
+        raise AIFilterError(f"Respuesta no válida de AI Filter: {e}, body={resp.text}") from e
+
 
-    data = resp.json()
-    # Esperamos campos: importance, score, reason, headline, source_name, source_country
-    return {
-        "importance": data.get("importance"),
-        "score": data.get("score"),
-        "reason": data.get("reason"),
-        "headline": data.get("headline"),
-        "source_name": data.get("source_name"),
-        "source_country": data.get("source_country"),
-    }
+def _classification(data: dict) -> ClassifyResult:
+    # Campos que falten o vengan vacíos: mismos valores por defecto que guardaba el worker
+    return ClassifyResult(
+        importance=data.get("importance") or "NOT_IMPORTANT",
+        score=data.get("score") or 0.0,
+        reason=data.get("reason") or "",
+        headline=data.get("headline") or "",
+        source_name=data.get("source_name") or "",
+        source_country=data.get("source_country") or "",
+    )
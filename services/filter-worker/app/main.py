@@ -1,3 +1,4 @@
+import asyncio
 import json
 from contextlib import contextmanager
 
@@ -5,7 +6,7 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from .db import SessionLocal
-from .ai_client import classify_change, AIFilterError
+from .ai_client import classify_changes, close_client, AIFilterError
 from .diff_utils import build_diff, is_trivial_diff
 
 
@@ -112,7 +113,65 @@ def load_notification(raw_notification, raw_content: str | None):
     return {}
 
 
-def classify_pending_changes(batch_size: int = 50):
+def build_classify_kwargs(row) -> dict:
+    """
+    Item de classify_changes (campos de ChangeInput de AI Filter) para una fila: textos, diff y metadatos de la
+    notificación de Wachete (task_name, timestamp).
+    """
+    title = row["title"]
+    prev = row.get("previous_text") or ""
+    curr = row.get("current_text") or ""
+    diff_text = row.get("diff_text") or build_diff(prev, curr)
+    raw_notification = load_notification(
+        row.get("raw_notification"), row.get("raw_content")
+    )
+    task_name = (
+        raw_notification.get("taskName")
+        or raw_notification.get("name")
+        or raw_notification.get("task", {}).get("name")
+        or title
+    )
+    timestamp = (
+        raw_notification.get("timestamp")
+        or raw_notification.get("date")
+        or raw_notification.get("createdAt")
+        or raw_notification.get("time")
+    )
+    created_at = row.get("created_at")
+    if not timestamp and created_at:
+        try:
+            timestamp = created_at.isoformat()
+        except AttributeError:
+            timestamp = str(created_at)
+
+    text_fallback = ""
+    raw_content = row.get("raw_content") or ""
+    if not curr and raw_content:
+        try:
+            parsed_raw = json.loads(raw_content)
+            text_fallback = (
+                parsed_raw.get("current")
+                or parsed_raw.get("comparand")
+                or parsed_raw.get("content")
+                or parsed_raw.get("html")
+                or raw_content
+            )
+        except json.JSONDecodeError:
+            text_fallback = raw_content
+
+    return {
+        "title": title,
+        "diff_text": diff_text,
+        "current_snippet": (curr or text_fallback)[:800] if (curr or text_fallback) else None,
+        "previous_text": prev or None,
+        "current_text": curr or None,
+        "url": row["url"],
+        "task_name": task_name,
+        "timestamp": timestamp,
+    }
+
+
+async def classify_pending_changes(batch_size: int = 50):
     processed = 0
     updated = 0
     errors = 0
@@ -123,49 +182,11 @@ def classify_pending_changes(batch_size: int = 50):
             if not rows:
                 break
 
+            pending = []
             for row in rows:
                 change_id = row["id"]
-                title = row["title"]
-                url = row["url"]
-                prev = row.get("previous_text") or ""
-                curr = row.get("current_text") or ""
-                diff_text = row.get("diff_text") or build_diff(prev, curr)
-                raw_notification = load_notification(
-                    row.get("raw_notification"), row.get("raw_content")
-                )
-                task_name = (
-                    raw_notification.get("taskName")
-                    or raw_notification.get("name")
-                    or raw_notification.get("task", {}).get("name")
-                    or title
-                )
-                timestamp = (
-                    raw_notification.get("timestamp")
-                    or raw_notification.get("date")
-                    or raw_notification.get("createdAt")
-                    or raw_notification.get("time")
-                )
-                created_at = row.get("created_at")
-                if not timestamp and created_at:
-                    try:
-                        timestamp = created_at.isoformat()
-                    except AttributeError:
-                        timestamp = str(created_at)
-
-                text_fallback = ""
-                raw_content = row.get("raw_content") or ""
-                if not curr and raw_content:
-                    try:
-                        parsed_raw = json.loads(raw_content)
-                        text_fallback = (
-                            parsed_raw.get("current")
-                            or parsed_raw.get("comparand")
-                            or parsed_raw.get("content")
-                            or parsed_raw.get("html")
-                            or raw_content
-                        )
-                    except json.JSONDecodeError:
-                        text_fallback = raw_content
+                kwargs = build_classify_kwargs(row)
+                diff_text = kwargs["diff_text"]
 
                 # Regla previa: si parece un cambio numérico trivial, lo marcamos sin IA
                 if diff_text and is_trivial_diff(diff_text):
@@ -189,19 +210,16 @@ def classify_pending_changes(batch_size: int = 50):
                     processed += 1
                     continue
 
-                try:
-                    result = classify_change(
-                        title=title,
-                        diff_text=diff_text,
-                        current_snippet=(curr or text_fallback)[:800] if (curr or text_fallback) else None,
-                        previous_text=prev or None,
-                        current_text=curr or None,
-                        url=url,
-                        task_name=task_name,
-                        timestamp=timestamp,
-                    )
-                except AIFilterError as e:
-                    print(f"[ERROR] Falló clasificación para id={change_id}: {e}")
+                pending.append((change_id, kwargs))
+
+            # /classify/many en tandas: AI Filter clasifica cada tanda en paralelo y
+            # devuelve el resultado o el error de cada cambio
+            outcomes = await classify_changes([kwargs for _, kwargs in pending])
+
+            for (change_id, kwargs), result in zip(pending, outcomes):
+                diff_text = kwargs["diff_text"]
+                if isinstance(result, AIFilterError):
+                    print(f"[ERROR] Falló clasificación para id={change_id}: {result}")
                     db.execute(
                         text(
                             """
@@ -215,13 +233,6 @@ def classify_pending_changes(batch_size: int = 50):
                     errors += 1
                     continue
 
-                importance = result.get("importance") or "NOT_IMPORTANT"
-                score = result.get("score") or 0.0
-                reason = result.get("reason") or ""
-                headline = result.get("headline") or ""
-                source_name = result.get("source_name") or ""
-                source_country = result.get("source_country") or ""
-
                 db.execute(
                     text(
                         """
@@ -239,17 +250,17 @@ def classify_pending_changes(batch_size: int = 50):
                         WHERE id = :id
                         """
                     ),
-                        {
-                            "id": change_id,
-                            "importance": importance,
-                            "score": score,
-                            "reason": reason,
-                            "diff_text": diff_text,
-                            "headline": headline,
-                            "source_name": source_name,
-                            "source_country": source_country,
-                        },
-                    )
+                    {
+                        "id": change_id,
+                        "importance": result.importance,
+                        "score": result.score,
+                        "reason": result.reason,
+                        "diff_text": diff_text,
+                        "headline": result.headline,
+                        "source_name": result.source_name,
+                        "source_country": result.source_country,
+                    },
+                )
                 updated += 1
                 processed += 1
 
@@ -297,6 +308,13 @@ def retry_error_changes():
     print(f"Reseteados {len(error_ids)} registros para reintento")
 
 
+async def run_classification():
+    try:
+        await classify_pending_changes()
+    finally:
+        await close_client()
+
+
 def main():
     print("Ejecutando worker de filtrado IA...")
 
@@ -307,7 +325,7 @@ def main():
         print(f"[WARN] Error en retry de cambios fallidos: {e}")
 
     # Then process new changes
-    classify_pending_changes()
+    asyncio.run(run_classification())
 
 
 if __name__ == "__main__":